@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# PEP8:OK, LINT:OK, PY3:OK
+
+'''
+Stub Syncthing REST servers to try the fleet monitor without a fleet.
+
+    python3 fleet_stub.py --count 50 --port 9000 --delay 0.05 --down 5
+
+serve the endpoints the fleet monitor use (health, version, folders,
+db status) on --count consecutive ports, answer after --delay sec,
+the last --down ones never answer, the --broken ones before them
+answer JSON of another shape. Print the [fleet] settings to paste
+in ~/.config/syncthingui/syncthingui.conf.
+
+    python3 fleet_stub.py --count 1 --folders 300 --devices 40
+
+each node also serve a config of --folders shared with --devices
+(system status, config, db completion) for the completion matrix.
+
+    python3 fleet_stub.py --bench --folders 300 --devices 40
+
+sweep that completion matrix with syncthingui CompletionAggregator at
+--concurrency 1,6,16, then time events, reconnect and config reload.
+'''
+
+import json
+import time
+from argparse import ArgumentParser
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Thread
+from urllib.parse import parse_qs, urlparse
+
+APIKEY = "stub"
+FOLDERS = 3
+MY_ID = "STUB000-AAAAAAA"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """one stub syncthing, keep-alive like the real one"""
+    protocol_version = "HTTP/1.1"
+    # headers and body are written apart: no delayed ACK wait (go does it)
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        """one handler per connection: count them"""
+        self.server.connections += 1
+        BaseHTTPRequestHandler.setup(self)
+
+    def do_GET(self):
+        """answer like syncthing would"""
+        url = urlparse(self.path)
+        node = self.server.node
+        self.server.requests += 1
+        time.sleep(self.server.delay)
+        if self.server.down:
+            time.sleep(3600)
+        if self.server.broken:
+            return self.answer(200, ["not", "a", "dict"])
+        if url.path == "/rest/noauth/health":
+            data = {"status": "OK"}
+        elif self.headers.get("X-API-Key") != APIKEY:
+            return self.answer(403, {"error": "forbidden"})
+        elif url.path == "/rest/system/version":
+            data = {"version": "v1.27.%d" % (node % 4)}
+        elif url.path == "/rest/config/folders":
+            data = [{"id": "folder%d" % num} for num in range(FOLDERS)]
+        elif url.path == "/rest/system/status":
+            data = {"myID": MY_ID}
+        elif url.path == "/rest/config":
+            data = self.server.config
+        elif url.path == "/rest/db/completion":
+            query = parse_qs(url.query)
+            key = hash((query["folder"][0], query["device"][0])) % 20
+            data = {"completion": 100.0 if key else 50.0 + key,
+                    "needBytes": 0 if key else 1 << 20}
+        elif url.path == "/rest/db/status":
+            folder = parse_qs(url.query).get("folder", [""])[0]
+            data = {"state": "idle", "errors": int(node % 3 == 0),
+                    "pullErrors": 0,
+                    "needBytes": (node * 1000003 + len(folder)) % (1 << 30)}
+        else:
+            return self.answer(404, {"error": "not found"})
+        self.answer(200, data)
+
+    def answer(self, status, data):
+        """json answer with length, the connection stay open"""
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """quiet"""
+        pass
+
+
+def topology(folders, devices):
+    """config of folders shared with every device (and ours)"""
+    ids = [MY_ID] + ["DEV%04d-AAAAAAA" % num for num in range(devices)]
+    return {"devices": [{"deviceID": device, "name": device[:7].lower()}
+                        for device in ids],
+            "folders": [{"id": "folder%03d" % num,
+                         "label": "Folder %d" % num,
+                         "devices": [{"deviceID": device} for device in ids]}
+                        for num in range(folders)]}
+
+
+def serve(node, port, delay, down, config=None, broken=False):
+    """start one stub server in a daemon thread, port 0: any free one"""
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.node, server.delay, server.down = node, delay, down
+    server.broken = broken
+    server.requests = server.connections = 0
+    server.config = config or topology(FOLDERS, 2)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def bench(folders, devices, port, concurrencies):
+    """time the completion matrix of syncthingui against one stub"""
+    from PyQt5.QtCore import QCoreApplication, QEventLoop, QTimer
+    import syncthingui
+    app = QCoreApplication([])
+    wake = QTimer()  # processEvents() never wait for long
+    wake.start(50)
+    server = serve(0, port, 0.0, False, topology(folders, devices))
+    rest = syncthingui.RestClient("http://127.0.0.1:%d" % port, APIKEY)
+
+    def wait(done, timeout=300.0):
+        """run the event loop until done()"""
+        start = time.monotonic()
+        while not done() and time.monotonic() - start < timeout:
+            app.processEvents(QEventLoop.WaitForMoreEvents)
+        return time.monotonic() - start
+
+    def idle(aggregator):
+        """no completion request queued or in flight"""
+        return lambda: not aggregator.queue and not aggregator.in_flight
+
+    print("%d folders x %d devices" % (folders, devices))
+    for concurrency in concurrencies:
+        aggregator = syncthingui.CompletionAggregator(rest, concurrency)
+        server.requests = 0
+        aggregator.refresh()
+        elapsed = wait(lambda: aggregator.swept)
+        print("sweep concurrency %2d: %d cells in %.2f sec, %d requests" % (
+            concurrency, len(aggregator.cache), elapsed, server.requests))
+    server.requests = 0
+    start = time.monotonic()
+    for num in range(1000):
+        aggregator.syncthing_event(syncthingui.SyncthingEvent(
+            num, "FolderCompletion", "",
+            {"folder": "folder%03d" % (num % folders),
+             "device": "DEV%04d-AAAAAAA" % (num % devices),
+             "completion": 42.0, "needBytes": 123}))
+    print("1000 FolderCompletion events: %.1f ms, %d requests" % (
+        (time.monotonic() - start) * 1000, server.requests))
+    server.requests = 0
+    aggregator.syncthing_event(syncthingui.SyncthingEvent(
+        1001, "DeviceConnected", "", {"id": "DEV0000-AAAAAAA"}))
+    elapsed = wait(idle(aggregator))
+    print("DeviceConnected: %d requests in %.2f sec" % (
+        server.requests, elapsed))
+    server.requests = 0
+    aggregator.syncthing_event(syncthingui.SyncthingEvent(
+        1002, "ConfigSaved", "", {}))
+    wait(lambda: server.requests >= 2 and not aggregator.in_flight)
+    wait(idle(aggregator), 1.0)
+    print("ConfigSaved, config unchanged: %d requests" % server.requests)
+    start = time.monotonic()
+    for _ in range(100):
+        summary = aggregator.summary()
+    print("summary() %.2f ms: %s" % ((time.monotonic() - start) * 10,
+                                     summary))
+
+
+def main():
+    """start the stubs, print their settings, serve until Ctrl+C"""
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=50)
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--delay", type=float, default=0.05,
+                        help="seconds before each answer")
+    parser.add_argument("--down", type=int, default=0,
+                        help="number of nodes never answering")
+    parser.add_argument("--broken", type=int, default=0,
+                        help="number of nodes answering unexpected JSON")
+    parser.add_argument("--folders", type=int, default=FOLDERS)
+    parser.add_argument("--devices", type=int, default=2)
+    parser.add_argument("--bench", action="store_true",
+                        help="time the completion matrix, then exit")
+    parser.add_argument("--concurrency", default="1,6,16",
+                        help="completion requests in flight, --bench")
+    args = parser.parse_args()
+    if args.bench:
+        return bench(args.folders, args.devices, args.port,
+                     [int(num) for num in args.concurrency.split(",")])
+    config = topology(args.folders, args.devices)
+    for node in range(args.count):
+        serve(node, args.port + node, args.delay,
+              node >= args.count - args.down, config,
+              args.count - args.down - args.broken <= node <
+              args.count - args.down)
+    print("[fleet]")
+    print("size=%d" % args.count)
+    for node in range(args.count):
+        print("%d\\name=stub%02d" % (node + 1, node))
+        print("%d\\address=http://127.0.0.1:%d" % (node + 1, args.port + node))
+        print("%d\\apikey=%s" % (node + 1, APIKEY))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ in '__main__':
+    main()
@@ -5,44 +5,67 @@
 
 '''SyncthinGUI.'''
 
+import time
+_START = time.monotonic()  # --startup-timing: imports phase start
 import os
 import sys
+import re
+import json
+import gzip
+import mmap
+import queue
+import codecs
+import shutil
 import signal
+import socket
+import random
+import hashlib
+import ssl
 import psutil
-import time
-from threading import Timer, Event, Lock
+from threading import Thread
+from collections import deque
+from array import array
+from bisect import bisect_left, bisect_right
+from heapq import merge
 # imports
 # from datetime import datetime
 from ctypes import byref, cdll, create_string_buffer
+from concurrent.futures import ThreadPoolExecutor
 from getopt import getopt
-from subprocess import call, getoutput
+from http.client import HTTPConnection, HTTPSConnection, HTTPException
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from subprocess import call
 from urllib import request
+from urllib.parse import quote
 from webbrowser import open_new_tab
+from xml.etree import ElementTree
 
 # require python3-pyqt5
 try:
-    from PyQt5.QtCore import (QProcess, Qt, QTextStream, QUrl, pyqtSlot, QSize)
-    from PyQt5.QtGui import QIcon, QPixmap, QTransform, QTextOption, QTextCursor
-    from PyQt5.QtNetwork import QNetworkRequest
+    from PyQt5.QtCore import (QProcess, Qt, QTextStream, QUrl, pyqtSlot, QSize,
+                              QCoreApplication, QProcessEnvironment,
+                              QObject, QTimer, pyqtSignal, QThread,
+                              QMetaObject, QSettings, QStandardPaths,
+                              QAbstractListModel, QAbstractTableModel,
+                              QModelIndex, QVariant,
+                              QFile, QPointF, QSocketNotifier)
+    from PyQt5.QtGui import (QIcon, QPixmap, QStandardItem,
+                             QStandardItemModel, QFontDatabase, QImage,
+                             QPainter, QPixmapCache, QPolygonF)
+    from PyQt5.QtNetwork import (QNetworkAccessManager, QNetworkReply,
+                                 QNetworkRequest)
     from PyQt5.QtWidgets import (QApplication, QCheckBox, QInputDialog,
                              QMainWindow, QMenu, QMessageBox,
-                             QPlainTextEdit, QTextEdit,
+                             QPlainTextEdit,
                              QVBoxLayout, QHBoxLayout,
                              QShortcut, QSystemTrayIcon, QProgressBar,
-                             QSplitter, QWidget)
+                             QSplitter, QWidget, QStackedWidget, QTableView,
+                             QLabel, QAbstractItemView, QComboBox, QLineEdit,
+                             QPushButton, QListView, QFileDialog,
+                             QGridLayout)
 except ImportError:
     print("sudo apt install python3-pyqt5")
     exit(-1)
-try:
-    # ubuntu require: python3-pyqt5.qtwebkit
-    # WebKit1 based (deprecate)
-    #from PyQt5.QtWebKitWidgets import QWebView as QWebEngineView
-    # new in python3
-    #QT 5.12
-    from PyQt5.QtWebEngineWidgets import QWebEngineView
-except ImportError:
-    print("sudo apt install python3-pyqt5.qtwebengine")
-    exit(-1)
 
 import syncthingui_rc
 
@@ -64,163 +87,3824 @@ __url__ = 'https://github.com/coolshou/syncthingui#syncthingui'
 __source__ = ('https://github.com/coolshou/syncthingui/releases/latest')
 
 
-URL, SYNCTHING = "http://127.0.0.1:8384", "syncthing"
-HELP_URL_0 = "http://forum.syncthing.net"
-HELP_URL_1 = "https://github.com/syncthing/syncthing/releases"
-HELP_URL_2 = "http://docs.syncthing.net"
-HELP_URL_3 = "https://github.com/syncthing/syncthing/issues"
-HELP_URL_4 = "https://github.com/syncthing/syncthing"
-SHORTCUTS = """<b>Quit = CTRL + Q<br>Zoom Up = CTRL + +<br>
-               Zoom Down = CTRL + -<br>Zoom Reset = CTRL + 0"""
-HELPMSG = """<h3>SyncthinGUI</h3>Python3 Qt5 GUI for Syncthing,GPLv3+LGPLv3<hr>
-<i>KISS DRY SingleFile Async CrossDesktop CrossDistro SelfUpdating</i><br><br>
-DEV: <a href=https://github.com/coolshou/syncthingui>Coolshou</a><br>
-Original DEV: <a href=https://github.com/juancarlospaco>JuanCarlos</a><br>
-<br>
-""" + getoutput(SYNCTHING + ' --version')
+URL, SYNCTHING = "http://127.0.0.1:8384", "syncthing"
+HEALTH_PATH = "/rest/noauth/health"
+# REST API key (Settings > GUI > API Key), required by /rest/events
+APIKEY = os.environ.get("SYNCTHING_APIKEY", "")
+# event types we subscribe to, filtered on server side
+EVENT_TYPES = ("StateChanged", "FolderSummary", "FolderCompletion",
+               "FolderErrors", "DeviceConnected", "DeviceDisconnected",
+               "DevicePaused", "DeviceResumed", "ConfigSaved")
+# syncthing console lines kept, settings: console/lines
+CONSOLE_LINES = 5000
+# syncthing log lines kept for search/filter, settings: console/buffer
+LOG_LINES = 100000
+# syncthing output capture files, settings: log/enabled, log/max_mb,
+# log/backups, log/compress
+LOG_FILE = "syncthing.log"
+# pids of the syncthing we started (monitor first, then children)
+PID_FILE = "syncthing.pid"
+# application icon, rendered once per size/ratio/frame, settings: tray/frames
+ICON_SVG = ":/images/syncthingui.svg"
+ICON_FRAMES = 4
+ICON_SIZES = (16, 22, 24, 32, 48, 64)
+# local OpenMetrics exporter, settings: metrics/enabled, metrics/address,
+# metrics/port
+METRICS_ADDRESS, METRICS_PORT = "127.0.0.1", 8386
+# REST latency histogram buckets (sec)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+# remote syncthing fleet polling, settings array [fleet]: name, address,
+# apikey, cafile, fingerprint; fleet/interval (sec), fleet/concurrency,
+# fleet/timeout (sec), fleet/verify (see _gui_context(): not verified by
+# default)
+FLEET_INTERVAL, FLEET_CONCURRENCY, FLEET_TIMEOUT = 30.0, 8, 5.0
+# folder x device completion requests in flight (Qt queue them on at most 6
+# connections per host), settings: completion/enabled, completion/concurrency
+COMPLETION_CONCURRENCY = 16
+# seconds to wait for a graceful stop before SIGKILL,
+# settings: syncthing/stop_timeout
+STOP_TIMEOUT = 10.0
+# Web UI while the window is hidden: keep, freeze (no javascript run) or
+# discard (renderer memory released), applied after WEBUI_HIDDEN_DELAY sec,
+# settings: webui/hidden, webui/hidden_delay
+WEBUI_HIDDEN, WEBUI_HIDDEN_DELAY = "freeze", 60
+# Web UI disk cache (http and compiled javascript), settings: webui/cache_mb
+WEBUI_CACHE_MB = 64
+HELP_URL_0 = "http://forum.syncthing.net"
+HELP_URL_1 = "https://github.com/syncthing/syncthing/releases"
+HELP_URL_2 = "http://docs.syncthing.net"
+HELP_URL_3 = "https://github.com/syncthing/syncthing/issues"
+HELP_URL_4 = "https://github.com/syncthing/syncthing"
+SHORTCUTS = """<b>Quit = CTRL + Q<br>Zoom Up = CTRL + +<br>
+               Zoom Down = CTRL + -<br>Zoom Reset = CTRL + 0"""
+HELPMSG = """<h3>SyncthinGUI</h3>Python3 Qt5 GUI for Syncthing,GPLv3+LGPLv3<hr>
+<i>KISS DRY SingleFile Async CrossDesktop CrossDistro SelfUpdating</i><br><br>
+DEV: <a href=https://github.com/coolshou/syncthingui>Coolshou</a><br>
+Original DEV: <a href=https://github.com/juancarlospaco>JuanCarlos</a><br>
+<br>
+"""
+
+BASE_CSS = ("*{font-family:Oxygen}"
+            "body{background-color:lightgray}"
+            ".navbar-fixed-bottom{display:none}")
+# run at document creation, before <head> exist: the style is added as soon
+# as the document element is, so the first paint is already customized
+BASE_JS = """(function () {
+var custom_css = document.createElement("style");
+custom_css.textContent = %s;
+function add() {
+    (document.head || document.documentElement).appendChild(custom_css);
+}
+if (document.documentElement) {
+    add();
+} else {
+    new MutationObserver(function (mutations, observer) {
+        if (document.documentElement) {
+            observer.disconnect();
+            add();
+        }
+    }).observe(document, {childList: true});
+}
+})();"""
+# run in the page world: Syncthing UI periodic refresh (angular $interval
+# use setInterval) slowed down to once every %d sec at most
+REFRESH_JS = """(function (minimum) {
+var setInterval_ = window.setInterval;
+window.setInterval = function (handler, delay) {
+    var args = Array.prototype.slice.call(arguments);
+    args[1] = Math.max(delay || 0, minimum);
+    return setInterval_.apply(window, args);
+};
+})(%d);"""
+
+
+def _gui_context(cafile="", verify=False):
+    """
+    ssl context for a syncthing GUI. Its certificate is self signed and
+    issued to "syncthing", not to the host name: by default it is not
+    verified (_ignore_ssl_errors() for Qt), with cafile its chain only
+    is checked, verify check it against the system CAs
+    """
+    if verify and not cafile:
+        return ssl.create_default_context()
+    context = ssl.create_default_context(cafile=cafile or None)
+    context.check_hostname = False
+    if not cafile:
+        context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+def _ignore_ssl_errors(nam):
+    """_gui_context() default policy for a QNetworkAccessManager"""
+    nam.sslErrors.connect(lambda reply, errors: reply.ignoreSslErrors())
+
+
+def rest_post(url, path, apikey, timeout=2.0):
+    """blocking REST POST, return True when syncthing accepted it"""
+    req = request.Request(url + path, data=b"", method="POST",
+                          headers={"X-API-Key": apikey})
+    context = _gui_context() if url.startswith("https:") else None
+    try:
+        with request.urlopen(req, timeout=timeout, context=context) as resp:
+            return resp.status == 200
+    except OSError:
+        return False
+
+
+class Network(QObject):
+    """
+    one QNetworkAccessManager for the REST calls and health checks of
+    every syncthing instance (GUI thread), answers dispatched per reply
+    """
+    def __init__(self, parent=None):
+        """ construct """
+        super(Network, self).__init__(parent)
+        self.nam = QNetworkAccessManager(self)
+        self.nam.finished.connect(self._done)
+        _ignore_ssl_errors(self.nam)
+        self._handlers = {}  # reply: handler(reply)
+
+    def get(self, req, handler):
+        """GET, handler(reply) called when finished"""
+        reply = self.nam.get(req)
+        self._handlers[reply] = handler
+        return reply
+
+    def post(self, req, data, handler):
+        """POST, handler(reply) called when finished"""
+        reply = self.nam.post(req, data)
+        self._handlers[reply] = handler
+        return reply
+
+    @pyqtSlot(QNetworkReply)
+    def _done(self, reply):
+        """pass reply to the handler of its request"""
+        handler = self._handlers.pop(reply, None)
+        if handler is not None:
+            handler(reply)
+        else:
+            reply.deleteLater()
+
+
+_NETWORK = None
+
+
+def network():
+    """Network shared by the GUI thread objects"""
+    global _NETWORK
+    if _NETWORK is None:
+        _NETWORK = Network()
+    return _NETWORK
+
+
+def syncthing_home():
+    """default syncthing home directory, the one holding config.xml"""
+    if os.environ.get("STHOMEDIR"):
+        return os.environ["STHOMEDIR"]
+    home = os.path.expanduser("~")
+    if sys.platform.startswith("win"):
+        candidates = [os.path.join(os.environ.get("LOCALAPPDATA", home),
+                                   "Syncthing")]
+    elif sys.platform == "darwin":
+        candidates = [os.path.join(home, "Library", "Application Support",
+                                   "Syncthing")]
+    else:
+        # syncthing >= 1.27 default to the state dir, older to the config dir
+        candidates = [
+            os.path.join(os.environ.get("XDG_STATE_HOME") or
+                         os.path.join(home, ".local", "state"), "syncthing"),
+            os.path.join(os.environ.get("XDG_CONFIG_HOME") or
+                         os.path.join(home, ".config"), "syncthing")]
+    for path in candidates:
+        if os.path.exists(os.path.join(path, "config.xml")):
+            return path
+    return candidates[-1]
+
+
+def read_gui_config(path):
+    """
+    GUI url and API key from a syncthing config.xml, None when not found.
+    <gui> follow every folder and device: stop parsing at its end, and
+    drop the elements read before
+    """
+    depth = 0
+    gui = None
+    try:
+        for event, elem in ElementTree.iterparse(path, ("start", "end")):
+            if event == "start":
+                depth += 1
+                continue
+            depth -= 1
+            if depth == 1:  # child of <configuration> complete
+                if elem.tag == "gui":
+                    gui = elem
+                    break
+                elem.clear()
+    except (OSError, ElementTree.ParseError) as reason:
+        print("%s: %s" % (path, reason))
+        return None
+    if gui is None:
+        return None
+    address = (gui.findtext("address") or "").strip()
+    if not address or address.startswith("unix"):
+        return None  # no GUI, or on a unix socket
+    host, _, port = address.rpartition(":")
+    # listening on every address: connect to the local one
+    host = {"0.0.0.0": "127.0.0.1", "[::]": "[::1]", "": "127.0.0.1"}.get(
+        host, host)
+    tls = gui.get("tls", "false").lower() == "true"
+    return dict(url="%s://%s:%s" % ("https" if tls else "http", host, port),
+                apikey=(gui.findtext("apikey") or "").strip(), tls=tls)
+
+
+class SyncthingConfig(object):
+    """GUI settings of a syncthing home, read again only when modified"""
+    def __init__(self, home=None):
+        """ construct, home: syncthing -home (None: default home) """
+        self.path = os.path.join(home or syncthing_home(), "config.xml")
+        self.mtime = None
+        self.gui = None
+
+    def read(self):
+        """read_gui_config() result, cached while the file mtime is the same"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None  # syncthing create it on first start
+        if mtime != self.mtime:
+            self.mtime = mtime
+            self.gui = read_gui_config(self.path)
+        return self.gui
+
+
+def instance_settings():
+    """
+    syncthing instances to manage, settings array [instances]: name, home
+    (syncthing -home directory), address (GUI) and apikey. None configured:
+    the syncthing of the default home, API key from SYNCTHING_APIKEY.
+    Address and API key not set: read from the home config.xml
+    """
+    settings = QSettings()
+    instances = []
+    for num in range(settings.beginReadArray("instances")):
+        settings.setArrayIndex(num)
+        address = str(settings.value("address", "")).rstrip("/") or None
+        if address and "://" not in address:
+            address = "http://" + address
+        instances.append(dict(
+            name=str(settings.value("name", "") or "instance%d" % (num + 1)),
+            home=str(settings.value("home", "")) or None,
+            url=address,
+            apikey=str(settings.value("apikey", APIKEY))))
+    settings.endArray()
+    return instances or [dict(name="default", home=None, url=None,
+                              apikey=APIKEY)]
+
+
+def _healthy(reply):
+    """True when reply is a syncthing health OK, reply is deleted"""
+    healthy = False
+    if reply.error() == QNetworkReply.NoError:
+        try:
+            data = json.loads(bytes(reply.readAll()).decode("utf-8"))
+            healthy = data.get("status") == "OK"
+        except (ValueError, AttributeError):
+            pass  # not a syncthing answer
+    reply.deleteLater()
+    return healthy
+
+
+def health_check(url, callback, timeout=1.0):
+    """one health check without blocking, callback(healthy) later"""
+    req = QNetworkRequest(QUrl(url + HEALTH_PATH))
+    if hasattr(req, "setTransferTimeout"):  # Qt 5.15
+        req.setTransferTimeout(int(timeout * 1000))
+    network().get(req, lambda reply: callback(_healthy(reply)))
+
+
+class ReadinessProbe(QObject):
+    """poll syncthing health endpoint with exponential backoff until ready"""
+    ready = pyqtSignal(float)  # seconds elapsed since start()
+    gaveup = pyqtSignal(float)
+
+    def __init__(self, url=URL, first=0.05, maximum=2.0, deadline=120.0,
+                 parent=None):
+        """ construct """
+        super(ReadinessProbe, self).__init__(parent)
+        self.url = url
+        self.first = first  # first retry delay (sec)
+        self.maximum = maximum  # max retry delay (sec)
+        self.deadline = deadline  # give up after this (sec)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._probe)
+        self._active = False
+        self._delay = first
+        self._start = 0.0
+
+    def start(self):
+        """(re)start probing"""
+        self._active = True
+        self._delay = self.first
+        self._start = time.monotonic()
+        self._probe()
+
+    def stop(self):
+        """stop probing, pending answer will be ignored"""
+        self._active = False
+        self.timer.stop()
+
+    def _probe(self):
+        """send one health request"""
+        health_check(self.url, self._probe_done)
+
+    def _probe_done(self, healthy):
+        """schedule next probe when not ready"""
+        if not self._active:
+            return
+        elapsed = time.monotonic() - self._start
+        if healthy:
+            self._active = False
+            self.ready.emit(elapsed)
+        elif elapsed > self.deadline:
+            self._active = False
+            self.gaveup.emit(elapsed)
+        else:
+            self.timer.start(int(self._delay * 1000))
+            self._delay = min(self._delay * 2, self.maximum)
+
+
+class Supervisor(QObject):
+    """
+    watch the syncthing we started: restart it after a crash with
+    exponential backoff and jitter, give up on crash loop (max_exits
+    within window sec), and restart it when it stop answering the
+    liveness probe (failures probes in a row)
+    """
+    restart = pyqtSignal(str)  # reason
+    hung = pyqtSignal(str)  # stop it, restart follow its exit
+    gaveup = pyqtSignal(str)
+    changed = pyqtSignal()  # history or probe stats updated
+
+    def __init__(self, url=URL, max_exits=5, window=60.0, first=1.0,
+                 maximum=60.0, interval=30.0, failures=3, parent=None):
+        """ construct """
+        super(Supervisor, self).__init__(parent)
+        self.url = url
+        self.first = first  # first restart delay (sec)
+        # (time.time(), exit code or reason, uptime sec, restart delay)
+        self.history = deque(maxlen=50)
+        # liveness probe latencies (ms), None when failed
+        self.latencies = deque(maxlen=120)
+        self.failed = 0  # probes failed in a row
+        self.crashes = 0  # unexpected exits in a row
+        self.exits = 0  # unexpected exits, ever
+        self.restarts = 0  # restarts requested, ever
+        self.started_at = None
+        self.expected = True  # exit is ours (stop/quit)
+        self.hang = None  # reason when we stop it for not answering
+        self.crashloop = False
+        self.restart_at = None
+        self.restart_reason = ""
+        self.restart_timer = QTimer(self)
+        self.restart_timer.setSingleShot(True)
+        self.restart_timer.timeout.connect(self._restart)
+        self.probe_timer = QTimer(self)
+        self.probe_timer.timeout.connect(self._probe)
+        self._sent = 0.0
+        self._reply = None
+        self.configure(max_exits, window, maximum, interval, failures)
+
+    def configure(self, max_exits=5, window=60.0, maximum=60.0,
+                  interval=30.0, failures=3):
+        """set crash loop, backoff and liveness probe limits"""
+        self.max_exits = max_exits
+        self.window = window  # sec, crash loop and stable uptime
+        self.maximum = maximum  # max restart delay (sec)
+        self.failures = failures
+        self.probe_timer.setInterval(int(interval * 1000))
+
+    def reset(self):
+        """user (re)start: forget crash loop"""
+        self.crashes = 0
+        self.crashloop = False
+        self.restart_timer.stop()
+        self.restart_at = None
+        self.changed.emit()
+
+    def started(self):
+        """syncthing process started"""
+        self.started_at = time.monotonic()
+        self.expected = False
+        self.hang = None
+
+    def expect_exit(self):
+        """we are stopping syncthing, do not restart it"""
+        self.expected = True
+        self.unwatch()
+        self.restart_timer.stop()
+        self.restart_at = None
+
+    def watch(self):
+        """syncthing ready, start liveness probe"""
+        self.failed = 0
+        self.probe_timer.start()
+
+    def unwatch(self):
+        """stop liveness probe"""
+        self.probe_timer.stop()
+
+    def start_time(self):
+        """unix time of syncthing start, None when not running"""
+        if self.started_at is None:
+            return None
+        return time.time() - (time.monotonic() - self.started_at)
+
+    def uptime(self):
+        """seconds since syncthing start, None when not running"""
+        if self.started_at is None:
+            return None
+        return time.monotonic() - self.started_at
+
+    def exited(self, reason):
+        """syncthing exit (code) or hang (text), restart unless expected"""
+        uptime = self.uptime() or 0.0
+        self.started_at = None
+        self.unwatch()
+        if self.hang is not None:
+            reason, self.hang = self.hang, None
+        if self.expected:
+            self.history.append((time.time(), reason, uptime, None))
+            self.changed.emit()
+            return
+        self.expected = True
+        self.exits += 1
+        if uptime > self.window:
+            self.crashes = 0  # it was stable, start backoff again
+        self.crashes += 1
+        now = time.time()
+        recent = [item for item in self.history
+                  if item[3] is not None and now - item[0] < self.window]
+        if len(recent) + 1 >= self.max_exits:
+            self.crashloop = True
+            self.history.append((now, reason, uptime, None))
+            self.changed.emit()
+            self.gaveup.emit("Syncthing exited %d times in %.0f sec, "
+                             "not restarted (last: %s)" % (
+                                 len(recent) + 1, self.window, reason))
+            return
+        delay = min(self.first * 2 ** (self.crashes - 1), self.maximum)
+        delay *= random.uniform(0.75, 1.25)  # no restart in lock step
+        self.history.append((now, reason, uptime, delay))
+        self.restart_reason = "%s, restart %d" % (reason, self.crashes)
+        self.restart_at = time.monotonic() + delay
+        self.restart_timer.start(int(delay * 1000))
+        self.changed.emit()
+
+    def _restart(self):
+        """backoff delay elapsed"""
+        self.restart_at = None
+        self.restarts += 1
+        self.restart.emit(self.restart_reason)
+
+    def _probe(self):
+        """send one liveness request, unanswered previous one failed"""
+        if self._reply is not None:
+            self._reply.abort()  # finished with error
+            if not self.probe_timer.isActive():
+                return  # that was one failure too many
+        req = QNetworkRequest(QUrl(self.url + HEALTH_PATH))
+        self._sent = time.monotonic()
+        self._reply = network().get(req, self._probe_done)
+
+    def _probe_done(self, reply):
+        """record latency, restart syncthing after too many failures"""
+        self._reply = None
+        healthy = False
+        if reply.error() == QNetworkReply.NoError:
+            try:
+                data = json.loads(bytes(reply.readAll()).decode("utf-8"))
+                healthy = data.get("status") == "OK"
+            except ValueError:
+                pass
+        reply.deleteLater()
+        if not self.probe_timer.isActive():
+            return  # stopped meanwhile
+        if healthy:
+            self.failed = 0
+            self.latencies.append((time.monotonic() - self._sent) * 1000)
+        else:
+            self.failed += 1
+            self.latencies.append(None)
+        self.changed.emit()
+        if self.failed >= self.failures:
+            # exited() schedule the restart once it is stopped
+            self.hang = "no answer to %d health checks" % self.failed
+            self.unwatch()
+            self.hung.emit(self.hang)
+
+    def probe_stats(self):
+        """(last, mean, max) latency ms of answered probes, failures"""
+        answered = [ms for ms in self.latencies if ms is not None]
+        if not answered:
+            return None, None, None, len(self.latencies)
+        return (answered[-1], sum(answered) / len(answered), max(answered),
+                len(self.latencies) - len(answered))
+
+
+class DiagnosticsPanel(QWidget):
+    """window showing syncthing restarts and liveness probe latency"""
+    def __init__(self, supervisor, parent=None):
+        """ construct """
+        super(DiagnosticsPanel, self).__init__(parent, Qt.Window)
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self.setWindowTitle("Syncthing diagnostics")
+        self.resize(600, 400)
+        self.supervisor = supervisor
+        self.info = QLabel(self)
+        self.model = QStandardItemModel(0, 4, self)
+        self.model.setHorizontalHeaderLabels(
+            ("Time", "Exit", "Uptime", "Restart in"))
+        view = QTableView(self)
+        view.setModel(self.model)
+        view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        view.horizontalHeader().setStretchLastSection(True)
+        view.verticalHeader().hide()
+        layout = QVBoxLayout()
+        layout.addWidget(self.info)
+        layout.addWidget(view)
+        self.setLayout(layout)
+        # uptime and restart countdown move on their own
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.update_info)
+        self.timer.start(1000)
+        supervisor.changed.connect(self.update_history)
+        self.update_history()
+
+    def update_info(self):
+        """uptime, pending restart and probe latencies"""
+        sup = self.supervisor
+        uptime = sup.uptime()
+        lines = ["Uptime: %s" % ("not running" if uptime is None else
+                                 "%.0f sec" % uptime)]
+        if sup.crashloop:
+            lines.append("Crash loop: not restarted, start it again "
+                         "from the Syncthing menu")
+        elif sup.restart_at is not None:
+            lines.append("Restart in %.0f sec (%s)" % (
+                max(0.0, sup.restart_at - time.monotonic()),
+                sup.restart_reason))
+        last, mean, worst, failed = sup.probe_stats()
+        if last is None:
+            lines.append("Liveness probe: no answer yet (%d failed)" %
+                         failed)
+        else:
+            lines.append("Liveness probe: last %.1f ms, mean %.1f ms, "
+                         "max %.1f ms, %d failed of %d" % (
+                             last, mean, worst, failed,
+                             len(sup.latencies)))
+        self.info.setText("\n".join(lines))
+
+    @pyqtSlot()
+    def update_history(self):
+        """restart history, newest first"""
+        self.model.removeRows(0, self.model.rowCount())
+        for when, reason, uptime, delay in reversed(self.supervisor.history):
+            self.model.appendRow([
+                QStandardItem(time.strftime("%H:%M:%S",
+                                            time.localtime(when))),
+                QStandardItem(str(reason)),
+                QStandardItem("%.0f sec" % uptime),
+                QStandardItem("-" if delay is None else "%.1f sec" % delay)])
+        self.update_info()
+
+
+class RingBuffer(object):
+    """fixed size array of floats, oldest values overwritten"""
+    __slots__ = ("data", "size", "pos", "count")
+
+    def __init__(self, size):
+        """ construct """
+        self.data = array("d", bytes(8 * size))
+        self.size = size
+        self.pos = 0  # next write
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, value):
+        """store value in place of the oldest one"""
+        self.data[self.pos] = value
+        self.pos = (self.pos + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def last(self, num=None):
+        """last num values (all by default), oldest first"""
+        num = self.count if num is None else min(num, self.count)
+        start = self.pos - num
+        if start >= 0:
+            return self.data[start:self.pos]
+        return self.data[start:] + self.data[:self.pos]
+
+    def latest(self):
+        """last value, 0 when empty"""
+        return self.data[self.pos - 1] if self.count else 0.0
+
+
+class ResourceSampler(QObject):
+    """
+    sample cpu, memory, io, fds and threads of the syncthing process tree
+    into ring buffers, every first sec while it is busy, slowing down to
+    maximum sec while it is idle
+    """
+    METRICS = ("cpu", "rss", "read", "write", "fds", "threads")
+    sampled = pyqtSignal()
+
+    def __init__(self, processes, size=600, first=1.0, maximum=10.0,
+                 rescan=30.0, parent=None):
+        """
+        construct, processes(): psutil.Process list to sample, called
+        again every rescan sec or when one of them exit (it scan /proc)
+        """
+        super(ResourceSampler, self).__init__(parent)
+        self.processes = processes
+        self.first = first
+        self.maximum = maximum
+        self.interval = first
+        self.fast = False  # sample every first sec (resource window open)
+        self.times = RingBuffer(size)
+        self.buffers = dict((name, RingBuffer(size))
+                            for name in self.METRICS)
+        self.rescan = rescan
+        self._procs = {}  # pid: psutil.Process, keep cpu_percent state
+        self._io = {}  # pid: (read_bytes, write_bytes) of last sample
+        self._last = 0.0
+        self._scanned = 0.0
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.sample)
+
+    def start(self):
+        """(re)start sampling at the fast rate"""
+        self.interval = self.first
+        if not self.timer.isActive():
+            self.sample()
+
+    def stop(self):
+        """stop sampling"""
+        self.timer.stop()
+
+    def set_fast(self, fast):
+        """sample every first sec whatever syncthing is doing"""
+        self.fast = fast
+        if fast:
+            self.start()
+
+    @pyqtSlot()
+    def sample(self):
+        """sample the process tree, stop when it is gone"""
+        now = time.monotonic()
+        if not self._procs or now - self._scanned > self.rescan:
+            self._scanned = now
+            self._procs = dict((proc.pid, self._procs.get(proc.pid, proc))
+                               for proc in self.processes())
+            if not self._procs:
+                self._io.clear()
+                self._last = 0.0
+                return  # start() again when syncthing is ready
+        elapsed = now - self._last if self._last else 0.0
+        self._last = now
+        cpu = rss = read = write = fds = threads = 0.0
+        gone = False
+        for proc in self._procs.values():
+            try:
+                with proc.oneshot():
+                    cpu += proc.cpu_percent()
+                    rss += proc.memory_info().rss
+                    threads += proc.num_threads()
+                    fds += (proc.num_fds() if hasattr(proc, "num_fds")
+                            else proc.num_handles())
+                    try:
+                        io = proc.io_counters()
+                    except (psutil.AccessDenied, AttributeError):
+                        io = None  # not available on this platform
+            except psutil.Error:
+                gone = True  # exited meanwhile
+                continue
+            if io is not None:
+                before = self._io.get(proc.pid)
+                self._io[proc.pid] = (io.read_bytes, io.write_bytes)
+                if before is not None and elapsed:
+                    read += (io.read_bytes - before[0]) / elapsed
+                    write += (io.write_bytes - before[1]) / elapsed
+        if gone:
+            self._procs = {}  # scan again next time
+        buffers = self.buffers
+        previous = buffers["rss"].latest()
+        self.times.append(time.time())
+        buffers["cpu"].append(cpu)
+        buffers["rss"].append(rss)
+        buffers["read"].append(read)
+        buffers["write"].append(write)
+        buffers["fds"].append(fds)
+        buffers["threads"].append(threads)
+        self.sampled.emit()
+        # busy: cpu or io or memory growth, sample fast again
+        busy = (cpu >= 2.0 or read + write >= 1048576 or
+                abs(rss - previous) >= 4194304)
+        if busy or self.fast:
+            self.interval = self.first
+        else:
+            self.interval = min(self.interval * 2, self.maximum)
+        self.timer.start(int(self.interval * 1000))
+
+
+class Sparkline(QWidget):
+    """draw the last values of a RingBuffer as a line, click emit clicked"""
+    clicked = pyqtSignal()
+
+    def __init__(self, buffer, width=60, height=16, parent=None):
+        """ construct """
+        super(Sparkline, self).__init__(parent)
+        self.buffer = buffer
+        self.setMinimumSize(width, height)
+
+    def paintEvent(self, event):
+        """one point per pixel, scaled to the max value shown"""
+        values = self.buffer.last(self.width())
+        if len(values) < 2:
+            return
+        top = max(values) or 1.0
+        height = self.height() - 2  # 1 pixel margin for the pen
+        offset = self.width() - len(values)
+        line = QPolygonF([QPointF(offset + num,
+                                  1 + height - value * height / top)
+                          for num, value in enumerate(values)])
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(self.palette().highlight().color())
+        painter.drawPolyline(line)
+        painter.end()
+
+    def mousePressEvent(self, event):
+        """ clicked """
+        self.clicked.emit()
+
+
+def resource_text(name, value):
+    """format a ResourceSampler metric"""
+    if name == "cpu":
+        return "%.1f %%" % value
+    if name == "rss":
+        return human_bytes(value)
+    if name in ("read", "write"):
+        return human_bytes(value) + "/s"
+    return "%d" % value
+
+
+class ResourceWindow(QWidget):
+    """window with one sparkline per ResourceSampler metric"""
+    LABELS = {"cpu": "CPU", "rss": "Memory (RSS)", "read": "Disk read",
+              "write": "Disk write", "fds": "Open files",
+              "threads": "Threads"}
+
+    def __init__(self, sampler, parent=None):
+        """ construct """
+        super(ResourceWindow, self).__init__(parent, Qt.Window)
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self.setWindowTitle("Syncthing resources")
+        self.resize(700, 400)
+        self.sampler = sampler
+        self.values = {}
+        self.charts = []
+        layout = QGridLayout()
+        for row, name in enumerate(sampler.METRICS):
+            chart = Sparkline(sampler.buffers[name], 400, 40, self)
+            self.values[name] = QLabel(self)
+            self.charts.append(chart)
+            layout.addWidget(QLabel(self.LABELS[name], self), row, 0)
+            layout.addWidget(chart, row, 1)
+            layout.addWidget(self.values[name], row, 2)
+        layout.setColumnStretch(1, 1)
+        self.setLayout(layout)
+        sampler.sampled.connect(self.update_values)
+        sampler.set_fast(True)
+        self.update_values()
+
+    @pyqtSlot()
+    def update_values(self):
+        """last and max of each metric"""
+        for name, label in self.values.items():
+            buffer = self.sampler.buffers[name]
+            label.setText("%s (max %s)" % (
+                resource_text(name, buffer.latest()),
+                resource_text(name, max(buffer.last()) if len(buffer)
+                              else 0.0)))
+        for chart in self.charts:
+            chart.update()
+
+    def closeEvent(self, event):
+        """back to adaptive sampling"""
+        self.sampler.set_fast(False)
+        super(ResourceWindow, self).closeEvent(event)
+
+
+# (phase, seconds) measured during startup, --startup-timing print them
+STARTUP_TIMING = []
+
+
+def startup_phase(phase, since):
+    """record duration of a startup phase, return now"""
+    now = time.monotonic()
+    STARTUP_TIMING.append((phase, now - since))
+    return now
+
+
+def startup_report():
+    """print startup phases duration"""
+    print("startup timing:")
+    for phase, seconds in STARTUP_TIMING:
+        print("  %-12s %8.1f ms" % (phase, seconds * 1000))
+    print("  %-12s %8.1f ms (RSS %.1f Mb)" % (
+        "total", (time.monotonic() - _START) * 1000,
+        psutil.Process().memory_info().rss / 1048576.0))
+
+
+def cache_dir(*parts):
+    """syncthingui directory in user cache dir, created if needed"""
+    path = os.path.join(QStandardPaths.writableLocation(
+        QStandardPaths.GenericCacheLocation), "syncthingui", *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def runtime_dir(*parts):
+    """syncthingui directory in user runtime dir, created if needed"""
+    path = os.path.join(QStandardPaths.writableLocation(
+        QStandardPaths.RuntimeLocation), "syncthingui", *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def own_syncthing(pid):
+    """psutil.Process of pid if it is a syncthing of current user"""
+    try:
+        proc = psutil.Process(pid)
+        if proc.name() != SYNCTHING:
+            return None  # pid reused by another program
+        if hasattr(os, "getuid") and proc.uids().real != os.getuid():
+            return None
+        return proc
+    except psutil.Error:
+        return None
+
+
+def load_webengine():
+    """
+    import QWebEngineView on demand, loading the Web UI cost >250Mb RAM
+    return None when QtWebEngine is not installed
+    """
+    try:
+        # ubuntu require: python3-pyqt5.qtwebkit
+        # WebKit1 based (deprecate)
+        #from PyQt5.QtWebKitWidgets import QWebView as QWebEngineView
+        # new in python3
+        #QT 5.12
+        from PyQt5.QtWebEngineWidgets import QWebEngineView
+    except ImportError:
+        print("sudo apt install python3-pyqt5.qtwebengine")
+        return None
+    return QWebEngineView
+
+
+_WEBENGINE_PROFILE = None
+
+
+def webengine_profile():
+    """
+    persistent QtWebEngine profile for the Web UI: the Syncthing GUI
+    javascript, css and fonts (and V8 code cache, kept with the http cache)
+    stay on disk between runs, features the Web UI do not use are off
+    """
+    global _WEBENGINE_PROFILE
+    if _WEBENGINE_PROFILE is not None:
+        return _WEBENGINE_PROFILE
+    from PyQt5.QtWebEngineWidgets import QWebEngineProfile, QWebEngineSettings
+    # named profile: not off-the-record, destroyed with the application
+    profile = QWebEngineProfile(QCoreApplication.applicationName(),
+                                QApplication.instance())
+    path = cache_dir("webengine")
+    profile.setCachePath(path)
+    profile.setPersistentStoragePath(os.path.join(path, "storage"))
+    profile.setHttpCacheType(QWebEngineProfile.DiskHttpCache)
+    profile.setHttpCacheMaximumSize(1024 * 1024 * int(
+        QSettings().value("webui/cache_mb", WEBUI_CACHE_MB)))
+    profile.setSpellCheckEnabled(False)
+    settings = profile.settings()
+    for name in ("WebGLEnabled", "PluginsEnabled",
+                 "Accelerated2dCanvasEnabled", "PdfViewerEnabled",
+                 "ScrollAnimatorEnabled", "HyperlinkAuditingEnabled",
+                 "DnsPrefetchEnabled", "JavascriptCanOpenWindows"):
+        if hasattr(QWebEngineSettings, name):  # attributes vary by Qt version
+            settings.setAttribute(getattr(QWebEngineSettings, name), False)
+    webui_scripts(profile.scripts())
+    _WEBENGINE_PROFILE = profile
+    return profile
+
+
+_WEBUI_PAGE = None
+
+
+def webui_page(manager, parent):
+    """
+    Web UI page on the syncthingui profile, accepting any certificate of
+    the manager syncthing GUI host (_gui_context() default policy)
+    """
+    global _WEBUI_PAGE
+    if _WEBUI_PAGE is None:
+        from PyQt5.QtWebEngineWidgets import QWebEnginePage
+
+        class WebUIPage(QWebEnginePage):
+            """QWebEnginePage trusting its syncthing GUI"""
+            def certificateError(self, error):
+                return error.url().host() == QUrl(self.manager.url).host()
+
+        _WEBUI_PAGE = WebUIPage
+    page = _WEBUI_PAGE(webengine_profile(), parent)
+    page.manager = manager
+    return page
+
+
+def webui_scripts(scripts):
+    """
+    register the Web UI customizations in a QWebEngineScriptCollection,
+    injected by QtWebEngine at document creation, nothing to run after load,
+    settings: webui/customize, webui/refresh_min (sec, 0: unchanged)
+    """
+    from PyQt5.QtWebEngineWidgets import QWebEngineScript
+    settings = QSettings()
+    for name in ("syncthingui-css", "syncthingui-refresh"):
+        for script in scripts.findScripts(name):
+            scripts.remove(script)
+    sources = []
+    if str(settings.value("webui/customize", "true")).lower() == "true":
+        # isolated world: page javascript can not see or break it
+        sources.append(("syncthingui-css", QWebEngineScript.ApplicationWorld,
+                        BASE_JS % json.dumps(BASE_CSS)))
+    refresh = int(settings.value("webui/refresh_min", 0))
+    if refresh > 0:
+        # page world: replace the page setInterval
+        sources.append(("syncthingui-refresh", QWebEngineScript.MainWorld,
+                        REFRESH_JS % (1000 * refresh)))
+    for name, world, source in sources:
+        script = QWebEngineScript()
+        script.setName(name)
+        script.setSourceCode(source)
+        script.setInjectionPoint(QWebEngineScript.DocumentCreation)
+        script.setWorldId(world)
+        script.setRunsOnSubFrames(False)
+        scripts.insert(script)
+
+
+def human_bytes(num):
+    """format bytes count for display"""
+    for unit in ("B", "KiB", "MiB", "GiB", "TiB"):
+        if abs(num) < 1024.0 or unit == "TiB":
+            break
+        num /= 1024.0
+    return "%d %s" % (num, unit) if unit == "B" else "%.1f %s" % (num, unit)
+
+
+def webengine_rss():
+    """resident memory of the QtWebEngine helper processes (renderers, gpu)"""
+    total = 0
+    try:
+        for proc in psutil.Process().children(recursive=True):
+            try:
+                if proc.name().startswith("QtWebEngineProc"):
+                    total += proc.memory_info().rss
+            except psutil.Error:
+                pass
+    except psutil.Error:
+        pass
+    return total
+
+
+def _render_frame(svg, size, angle):
+    """rasterize svg at size pixels, rotated by angle around its center"""
+    image = QImage(size, size, QImage.Format_ARGB32_Premultiplied)
+    image.fill(Qt.transparent)
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.Antialiasing)
+    painter.setRenderHint(QPainter.SmoothPixmapTransform)
+    painter.translate(QPointF(size / 2.0, size / 2.0))
+    painter.rotate(angle)
+    painter.translate(QPointF(-size / 2.0, -size / 2.0))
+    try:
+        from PyQt5.QtSvg import QSvgRenderer
+        QSvgRenderer(svg).render(painter)
+    except ImportError:  # svg image plugin, if any
+        painter.drawImage(0, 0, QImage.fromData(svg).scaled(
+            size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation))
+    painter.end()
+    return image
+
+
+def icon_frames(path=ICON_SVG, frames=ICON_FRAMES, sizes=ICON_SIZES,
+                ratios=(1.0,)):
+    """
+    QIcon of each rotation frame (frame 0 is the plain icon), at each
+    size and device pixel ratio. Frames are kept in QPixmapCache and as
+    PNG in cache_dir("icons") keyed by svg hash, so the svg is only
+    rendered again when it change
+    """
+    svg_file = QFile(path)
+    svg_file.open(QFile.ReadOnly)
+    svg = bytes(svg_file.readAll())
+    svg_file.close()
+    digest = hashlib.sha1(svg).hexdigest()[:16]
+    directory = cache_dir("icons")
+    icons = [QIcon() for _ in range(frames)]
+    rendered = 0
+    for size in sizes:
+        for ratio in ratios:
+            pixels = int(round(size * ratio))
+            for frame, icon in enumerate(icons):
+                key = "%s-%dx%d-%d-%d" % (digest, pixels, pixels, frame,
+                                          frames)
+                pixmap = QPixmapCache.find(key)
+                if pixmap is None or pixmap.isNull():
+                    png = os.path.join(directory, key + ".png")
+                    pixmap = QPixmap(png)
+                    if pixmap.isNull():
+                        image = _render_frame(svg, pixels,
+                                              360.0 * frame / frames)
+                        image.save(png, "PNG")
+                        pixmap = QPixmap.fromImage(image)
+                        rendered += 1
+                    QPixmapCache.insert(key, pixmap)
+                pixmap.setDevicePixelRatio(ratio)
+                icon.addPixmap(pixmap)
+    if rendered:
+        # forget frames of a previous icon
+        for name in os.listdir(directory):
+            if not name.startswith(digest):
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+    return icons
+
+
+class Histogram(object):
+    """cumulative latency histogram, OpenMetrics style"""
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """ construct """
+        self.buckets = buckets
+        self.counts = array("Q", bytes(8 * len(buckets)))
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """count value in its bucket"""
+        num = bisect_left(self.buckets, value)
+        if num < len(self.buckets):
+            self.counts[num] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """(le, count of values <= le) including +Inf"""
+        total = 0
+        for le, num in zip(self.buckets, self.counts):
+            total += num
+            yield le, total
+        yield float("inf"), self.count
+
+
+class RestClient(QObject):
+    """asynchronous syncthing REST API calls, on the GUI thread"""
+    finished = pyqtSignal()  # a call is answered (latency recorded)
+
+    def __init__(self, url=URL, apikey=APIKEY, parent=None):
+        """ construct """
+        super(RestClient, self).__init__(parent)
+        self.url = url
+        self.apikey = apikey
+        self._pending = {}  # reply: (path, callback, start time)
+        # endpoint (path without query): Histogram of request duration
+        self.latency = {}
+
+    def request(self, path, callback=None, method="GET"):
+        """send request, callback(data) get decoded json or None on error"""
+        req = QNetworkRequest(QUrl(self.url + path))
+        req.setRawHeader(b"X-API-Key", self.apikey.encode("utf-8"))
+        if hasattr(req, "setTransferTimeout"):  # Qt 5.15
+            req.setTransferTimeout(30000)
+        if method == "POST":
+            reply = network().post(req, b"", self._done)
+        else:
+            reply = network().get(req, self._done)
+        self._pending[reply] = (path, callback, time.monotonic())
+        return reply
+
+    def get(self, path, callback):
+        """GET path"""
+        return self.request(path, callback)
+
+    def post(self, path, callback=None):
+        """POST path with empty body"""
+        return self.request(path, callback, "POST")
+
+    def _done(self, reply):
+        """decode answer and call back"""
+        path, callback, start = self._pending.pop(reply, (None, None, None))
+        if path is not None:
+            endpoint = path.split("?", 1)[0]
+            if endpoint not in self.latency:
+                self.latency[endpoint] = Histogram()
+            self.latency[endpoint].observe(time.monotonic() - start)
+        data = None
+        if reply.error() == QNetworkReply.NoError:
+            try:
+                data = json.loads(bytes(reply.readAll()).decode("utf-8")
+                                  or "null")
+            except ValueError:
+                print("REST %s: not json" % path)
+        else:
+            print("REST %s: %s" % (path, reply.errorString()))
+        reply.deleteLater()
+        self.finished.emit()
+        if callback is not None:
+            callback(data)
+
+
+class Dashboard(QWidget):
+    """native folders/devices/throughput view, QtWebEngine free"""
+    FOLDER_COLUMNS = ("Folder", "State", "Completion", "Need")
+    DEVICE_COLUMNS = ("Device", "Connection", "Address", "In", "Out")
+
+    def __init__(self, rest, parent=None):
+        """ construct """
+        super(Dashboard, self).__init__(parent)
+        self.rest = rest
+        # id: row number
+        self.folder_rows = {}
+        self.device_rows = {}
+        self.my_id = None
+        self._last = None  # (time, {device: (in, out)}) of last poll
+        self.folders = QStandardItemModel(0, len(self.FOLDER_COLUMNS), self)
+        self.folders.setHorizontalHeaderLabels(self.FOLDER_COLUMNS)
+        self.devices = QStandardItemModel(0, len(self.DEVICE_COLUMNS), self)
+        self.devices.setHorizontalHeaderLabels(self.DEVICE_COLUMNS)
+        self.throughput = QLabel("Waiting for Syncthing...")
+
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel("<b>Folders</b>"))
+        layout.addWidget(self._table(self.folders))
+        layout.addWidget(QLabel("<b>Devices</b>"))
+        layout.addWidget(self._table(self.devices))
+        layout.addWidget(self.throughput)
+        self.setLayout(layout)
+
+        # no event report transfer rate: poll it while we are visible
+        self.timer = QTimer(self)
+        self.timer.setInterval(5000)
+        self.timer.timeout.connect(self.poll_connections)
+
+    def _table(self, model):
+        """read only table view of model"""
+        table = QTableView(self)
+        table.setModel(model)
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        table.verticalHeader().hide()
+        table.horizontalHeader().setStretchLastSection(True)
+        return table
+
+    def showEvent(self, event):
+        """start transfer rate polling"""
+        self.timer.start()
+        self.poll_connections()
+        super(Dashboard, self).showEvent(event)
+
+    def hideEvent(self, event):
+        """stop transfer rate polling"""
+        self.timer.stop()
+        super(Dashboard, self).hideEvent(event)
+
+    def refresh(self):
+        """reload folders and devices list from syncthing config"""
+        self.rest.get("/rest/system/status", self._status_done)
+
+    def _status_done(self, status):
+        """remember our own device id, then read config"""
+        if status is not None:
+            self.my_id = status.get("myID")
+        self.rest.get("/rest/config", self._config_done)
+
+    def _config_done(self, config):
+        """rebuild rows from config"""
+        if config is None:
+            self.throughput.setText("No answer from Syncthing REST API "
+                                    "(API key: SYNCTHING_APIKEY)")
+            return
+        self.folders.removeRows(0, self.folders.rowCount())
+        self.devices.removeRows(0, self.devices.rowCount())
+        self.folder_rows.clear()
+        self.device_rows.clear()
+        self._last = None
+        for folder in config.get("folders", []):
+            items = [QStandardItem(folder.get("label") or folder["id"])]
+            items += [QStandardItem("") for _ in self.FOLDER_COLUMNS[1:]]
+            items[0].setToolTip(folder.get("path", ""))
+            self.folder_rows[folder["id"]] = self.folders.rowCount()
+            self.folders.appendRow(items)
+            if folder.get("paused"):
+                items[1].setText("paused")
+                continue
+            self.rest.get("/rest/db/status?folder=" + quote(folder["id"]),
+                          lambda data, fid=folder["id"]:
+                          self.update_folder(fid, data))
+        for device in config.get("devices", []):
+            if device["deviceID"] == self.my_id:
+                continue
+            items = [QStandardItem(device.get("name") or
+                                   device["deviceID"][:7])]
+            items += [QStandardItem("") for _ in self.DEVICE_COLUMNS[1:]]
+            items[0].setToolTip(device["deviceID"])
+            self.device_rows[device["deviceID"]] = self.devices.rowCount()
+            self.devices.appendRow(items)
+        self.poll_connections()
+
+    @staticmethod
+    def _set(model, rows, key, column, text):
+        """set cell text of row key"""
+        row = rows.get(key)
+        if row is not None:
+            model.item(row, column).setText(text)
+
+    def update_folder(self, folder, status):
+        """update folder row from db/status or FolderSummary"""
+        if status is None:
+            return
+        total = status.get("globalBytes", 0)
+        need = status.get("needBytes", 0)
+        completion = 100.0 * (total - need) / total if total else 100.0
+        self._set(self.folders, self.folder_rows, folder, 1,
+                  status.get("state", ""))
+        self._set(self.folders, self.folder_rows, folder, 2,
+                  "%.1f %%" % completion)
+        self._set(self.folders, self.folder_rows, folder, 3,
+                  human_bytes(need))
+
+    def poll_connections(self):
+        """ask connections (transfer counters)"""
+        if self.device_rows or self._last is None:
+            self.rest.get("/rest/system/connections", self._connections_done)
+
+    def _connections_done(self, data):
+        """update devices connection state and rates"""
+        if data is None:
+            return
+        now = time.monotonic()
+        counters = {}
+        connections = dict(data.get("connections", {}))
+        connections[None] = data.get("total", {})
+        for device, conn in connections.items():
+            counters[device] = (conn.get("inBytesTotal", 0),
+                                conn.get("outBytesTotal", 0))
+        rates = {}
+        if self._last is not None:
+            elapsed = max(now - self._last[0], 0.001)
+            for device, (inb, outb) in counters.items():
+                lin, lout = self._last[1].get(device, (inb, outb))
+                rates[device] = (max(inb - lin, 0) / elapsed,
+                                 max(outb - lout, 0) / elapsed)
+        self._last = (now, counters)
+        for device, conn in data.get("connections", {}).items():
+            if conn.get("paused"):
+                state = "paused"
+            else:
+                state = "connected" if conn.get("connected") else \
+                    "disconnected"
+            self._set(self.devices, self.device_rows, device, 1, state)
+            self._set(self.devices, self.device_rows, device, 2,
+                      conn.get("address", ""))
+            inr, outr = rates.get(device, (0, 0))
+            self._set(self.devices, self.device_rows, device, 3,
+                      human_bytes(inr) + "/s")
+            self._set(self.devices, self.device_rows, device, 4,
+                      human_bytes(outr) + "/s")
+        inr, outr = rates.get(None, (0, 0))
+        self.throughput.setText(
+            "Download: %s/s (%s)   Upload: %s/s (%s)" % (
+                human_bytes(inr), human_bytes(counters[None][0]),
+                human_bytes(outr), human_bytes(counters[None][1])))
+
+    def syncthing_event(self, event):
+        """update rows from pushed events"""
+        data = event.data or {}
+        if event.type == "StateChanged":
+            self._set(self.folders, self.folder_rows, data.get("folder"), 1,
+                      data.get("to", ""))
+        elif event.type == "FolderSummary":
+            self.update_folder(data.get("folder"), data.get("summary"))
+        elif event.type in ("DeviceConnected", "DeviceDisconnected",
+                            "DevicePaused", "DeviceResumed"):
+            state = {"DeviceConnected": "connected",
+                     "DevicePaused": "paused"}.get(event.type,
+                                                   "disconnected")
+            self._set(self.devices, self.device_rows, data.get("id")
+                      or data.get("device"), 1, state)
+        elif event.type == "ConfigSaved":
+            self.refresh()
+
+
+class CompletionAggregator(QObject):
+    """
+    completion of every folder on every device sharing it: one sweep of
+    /rest/db/completion with at most concurrency requests in flight, then
+    cells are kept up to date from FolderCompletion events (no request),
+    DeviceConnected (that device folders only) and ConfigSaved (new
+    pairs only). Results are kept across syncthing restarts
+    """
+    changed = pyqtSignal()  # cells or topology updated, coalesced
+    # folders/devices lists replaced between these two
+    topology_about_to_change = pyqtSignal()
+    topology_changed = pyqtSignal()
+
+    def __init__(self, rest, concurrency=COMPLETION_CONCURRENCY,
+                 parent=None):
+        """ construct """
+        super(CompletionAggregator, self).__init__(parent)
+        self.rest = rest
+        self.concurrency = concurrency
+        self.my_id = None
+        self.folders = []  # (folder id, label), config order
+        self.devices = []  # (device id, name)
+        self.pairs = set()  # (folder id, device id) shared
+        self.cache = {}  # pair: (completion %, need bytes)
+        self.queue = deque()  # pairs waiting for a request
+        self.queued = set()
+        self.in_flight = 0
+        self.requests = 0  # completion requests sent, ever
+        self.sweep_start = None  # time of the first (full) sweep start
+        self.swept = False
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(250)
+        self.timer.timeout.connect(self.changed)
+
+    def refresh(self):
+        """read topology, fetch the pairs not known yet"""
+        self.rest.get("/rest/system/status", self._status_done)
+
+    def _status_done(self, status):
+        """own device id: not a completion column"""
+        if status is not None:
+            self.my_id = status.get("myID")
+        self.rest.get("/rest/config", self._config_done)
+
+    def _config_done(self, config):
+        """rebuild folders x devices, drop pairs no more shared"""
+        if config is None:
+            return
+        names = {device["deviceID"]: device.get("name") or
+                 device["deviceID"][:7] for device in config.get(
+                     "devices", [])}
+        folders, devices, pairs = [], {}, set()
+        for folder in config.get("folders", []):
+            folders.append((folder["id"], folder.get("label") or
+                            folder["id"]))
+            for device in folder.get("devices", []):
+                device_id = device["deviceID"]
+                if device_id != self.my_id:
+                    devices[device_id] = names.get(device_id, device_id[:7])
+                    pairs.add((folder["id"], device_id))
+        self.topology_about_to_change.emit()
+        self.folders = folders
+        self.devices = sorted(devices.items(), key=lambda item: item[1])
+        for pair in set(self.cache) - pairs:
+            del self.cache[pair]
+        self.pairs = pairs
+        self.topology_changed.emit()
+        self._changed()
+        if self.sweep_start is None:
+            self.sweep_start = time.monotonic()
+        self.fetch(pair for pair in pairs if pair not in self.cache)
+
+    def fetch(self, pairs):
+        """queue completion requests"""
+        for pair in pairs:
+            if pair not in self.queued:
+                self.queued.add(pair)
+                self.queue.append(pair)
+        self._send()
+
+    def _send(self):
+        """keep concurrency requests in flight"""
+        while self.queue and self.in_flight < self.concurrency:
+            pair = self.queue.popleft()
+            self.in_flight += 1
+            self.requests += 1
+            self.rest.get("/rest/db/completion?folder=%s&device=%s" % (
+                quote(pair[0]), quote(pair[1])),
+                lambda data, pair=pair: self._done(pair, data))
+
+    def _done(self, pair, data):
+        """one completion answer"""
+        self.in_flight -= 1
+        self.queued.discard(pair)
+        if data is not None and pair in self.pairs:
+            self._set(pair, data)
+        self._send()
+        if not self.swept and not self.queue and not self.in_flight:
+            self.swept = True
+            print("completion: %d folder x device in %.1f sec, %d requests"
+                  % (len(self.cache), time.monotonic() - self.sweep_start,
+                     self.requests))
+
+    def _set(self, pair, data):
+        """store one cell"""
+        self.cache[pair] = (float(data.get("completion", 0.0)),
+                            int(data.get("needBytes", 0)))
+        self._changed()
+
+    def _changed(self):
+        """emit changed soon, once for many cells"""
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def syncthing_event(self, event):
+        """update cells from pushed events"""
+        data = event.data or {}
+        if event.type == "FolderCompletion":
+            pair = (data.get("folder"), data.get("device"))
+            if pair in self.pairs:
+                self._set(pair, data)
+        elif event.type == "DeviceConnected":
+            device = data.get("id")
+            self.fetch(pair for pair in self.pairs if pair[1] == device)
+        elif event.type == "ConfigSaved":
+            self.refresh()
+
+    def summary(self):
+        """
+        (devices up to date, devices pending, devices known, bytes needed
+        by devices): a device is up to date when all its folders are known
+        at 100 %, pending when some are not known yet (sweep running or
+        request failed)
+        """
+        behind, pending = set(), set()
+        need = 0
+        cache = self.cache
+        for pair in self.pairs:
+            value = cache.get(pair)
+            if value is None:
+                pending.add(pair[1])
+            else:
+                need += value[1]
+                if value[0] < 100.0:
+                    behind.add(pair[1])
+        pending -= behind
+        return (len(self.devices) - len(behind) - len(pending),
+                len(pending), len(self.devices), need)
+
+
+class CompletionModel(QAbstractTableModel):
+    """folders x devices completion matrix of a CompletionAggregator"""
+    def __init__(self, aggregator, parent=None):
+        """ construct """
+        super(CompletionModel, self).__init__(parent)
+        self.aggregator = aggregator
+        aggregator.topology_about_to_change.connect(self.beginResetModel)
+        aggregator.topology_changed.connect(self.endResetModel)
+        aggregator.changed.connect(self.cells_changed)
+
+    @pyqtSlot()
+    def cells_changed(self):
+        """values changed: views repaint the visible cells only"""
+        if self.rowCount() and self.columnCount():
+            self.dataChanged.emit(
+                self.index(0, 0),
+                self.index(self.rowCount() - 1, self.columnCount() - 1))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.aggregator.folders)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.aggregator.devices)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+        pair = (self.aggregator.folders[index.row()][0],
+                self.aggregator.devices[index.column()][0])
+        if role == Qt.DisplayRole:
+            if pair not in self.aggregator.pairs:
+                return ""  # folder not shared with that device
+            value = self.aggregator.cache.get(pair)
+            return "..." if value is None else "%.0f %%" % value[0]
+        if role == Qt.ToolTipRole:
+            value = self.aggregator.cache.get(pair)
+            if value is not None:
+                return "%s need %s" % (
+                    self.aggregator.devices[index.column()][1],
+                    human_bytes(value[1]))
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        return QVariant()
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return QVariant()
+        if orientation == Qt.Horizontal:
+            return self.aggregator.devices[section][1]
+        return self.aggregator.folders[section][1]
+
+
+def _label(value):
+    """escape an OpenMetrics label value"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace(
+        "\n", "\\n")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """serve the last rendered metrics, never call syncthing"""
+    def do_GET(self):
+        """ GET /metrics """
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.exporter.body
+        if "application/openmetrics-text" in self.headers.get("Accept", ""):
+            ctype = "application/openmetrics-text; version=1.0.0; " \
+                    "charset=utf-8"
+        else:
+            ctype = "text/plain; version=0.0.4; charset=utf-8"
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """no access log on stderr"""
+        pass
+
+
+class MetricsExporter(QObject):
+    """
+    serve /metrics from a cache: folder states and sizes are updated by
+    syncthing events, connection totals by a slow poll, the text is
+    rendered on the GUI thread (at most once a sec, only when something
+    changed) and served as is by a small HTTP server thread
+    """
+    def __init__(self, manager, address=METRICS_ADDRESS, port=METRICS_PORT,
+                 poll=10.0, parent=None):
+        """ construct, manager: SyncthingManager with the data sources"""
+        super(MetricsExporter, self).__init__(parent)
+        self.manager = manager
+        self.rest = manager.rest
+        self.folders = {}  # folder id: db/status or FolderSummary
+        self.devices = {}  # device id: connection
+        self.connections = {}  # "total" connection
+        self.body = b"# EOF\n"
+        self.render_timer = QTimer(self)
+        self.render_timer.setSingleShot(True)
+        self.render_timer.setInterval(1000)
+        self.render_timer.timeout.connect(self.render)
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(int(poll * 1000))
+        self.poll_timer.timeout.connect(self.poll_connections)
+        self.server = HTTPServer((address, port), _MetricsHandler)
+        self.server.exporter = self
+        self.thread = Thread(target=self.server.serve_forever,
+                             name="metrics", daemon=True)
+        self.thread.start()
+        print("metrics on http://%s:%d/metrics" % (address, port))
+
+    def stop(self):
+        """stop serving"""
+        self.poll_timer.stop()
+        self.server.shutdown()
+        self.server.server_close()
+
+    @pyqtSlot()
+    def changed(self):
+        """render again soon"""
+        if not self.render_timer.isActive():
+            self.render_timer.start()
+
+    def refresh(self):
+        """syncthing ready: fill folders once, then follow events"""
+        if not self.rest.apikey:
+            return
+        self.rest.get("/rest/config", self._config_done)
+        self.poll_connections()
+        self.poll_timer.start()
+
+    def _config_done(self, config):
+        """ask status of each folder"""
+        for folder in (config or {}).get("folders", ()):
+            self.rest.get(
+                "/rest/db/status?folder=" + quote(folder["id"]),
+                lambda status, folder=folder["id"]:
+                self._folder(folder, status))
+
+    def _folder(self, folder, status):
+        """ store folder status """
+        if status:
+            self.folders[folder] = status
+            self.changed()
+
+    def poll_connections(self):
+        """connection totals, the only numbers without events"""
+        if self.manager.ready:
+            self.rest.get("/rest/system/connections", self._connections_done)
+
+    def _connections_done(self, data):
+        """ store connections """
+        if data:
+            self.devices = data.get("connections") or {}
+            self.connections = data.get("total") or {}
+            self.changed()
+
+    @pyqtSlot(object)
+    def syncthing_event(self, event):
+        """update cache from pushed events"""
+        data = event.data or {}
+        if event.type == "FolderSummary":
+            self._folder(data.get("folder"), data.get("summary"))
+        elif event.type in ("DeviceConnected", "DeviceDisconnected"):
+            device = self.devices.setdefault(data.get("id"), {})
+            device["connected"] = event.type == "DeviceConnected"
+        self.changed()
+
+    def render(self):
+        """render metrics text from the cache"""
+        out = []
+        add = out.append
+
+        def family(name, kind, text):
+            """ metric family header """
+            add("# TYPE %s %s" % (name, kind))
+            add("# HELP %s %s" % (name, text))
+
+        manager = self.manager
+        family("syncthingui_syncthing_up", "gauge",
+               "Syncthing answer health checks")
+        add("syncthingui_syncthing_up %d" % manager.ready)
+        family("syncthingui_folder_state", "gauge", "Folder state")
+        for folder, state in sorted(manager.folder_states.items(),
+                                    key=lambda item: str(item[0])):
+            add('syncthingui_folder_state{folder="%s",state="%s"} 1' % (
+                _label(folder), _label(state)))
+        for key, name in (("needBytes", "need"),
+                          ("globalBytes", "global"),
+                          ("localBytes", "local")):
+            family("syncthingui_folder_%s_bytes" % name, "gauge",
+                   "Folder %s bytes" % name)
+            for folder, status in sorted(self.folders.items()):
+                if key in status:
+                    add('syncthingui_folder_%s_bytes{folder="%s"} %d' % (
+                        name, _label(folder), status[key]))
+        family("syncthingui_device_connected", "gauge",
+               "Device connected")
+        for device, conn in sorted(self.devices.items()):
+            add('syncthingui_device_connected{device="%s"} %d' % (
+                _label(device), bool(conn.get("connected"))))
+        for key, name in (("inBytesTotal", "in"), ("outBytesTotal", "out")):
+            family("syncthingui_connection_%s_bytes" % name, "counter",
+                   "Bytes %s since syncthing start" % (
+                       "received" if name == "in" else "sent"))
+            if key in self.connections:
+                add("syncthingui_connection_%s_bytes_total %d" % (
+                    name, self.connections[key]))
+            for device, conn in sorted(self.devices.items()):
+                if key in conn:
+                    add('syncthingui_connection_%s_bytes_total{device="%s"}'
+                        ' %d' % (name, _label(device), conn[key]))
+        sup = manager.supervisor
+        family("syncthingui_supervisor_exits", "counter",
+               "Unexpected syncthing exits and hangs")
+        add("syncthingui_supervisor_exits_total %d" % sup.exits)
+        family("syncthingui_supervisor_restarts", "counter",
+               "Syncthing restarts by the supervisor")
+        add("syncthingui_supervisor_restarts_total %d" % sup.restarts)
+        family("syncthingui_supervisor_crashloop", "gauge",
+               "Syncthing left stopped after a crash loop")
+        add("syncthingui_supervisor_crashloop %d" % sup.crashloop)
+        start = sup.start_time()
+        if start is not None:
+            family("syncthingui_syncthing_start_time_seconds", "gauge",
+                   "Start time of the supervised syncthing")
+            add("syncthingui_syncthing_start_time_seconds %.3f" % start)
+        family("syncthingui_rest_request_duration_seconds", "histogram",
+               "Syncthing REST API request duration")
+        for endpoint, hist in sorted(self.rest.latency.items()):
+            path = _label(endpoint)
+            for le, count in hist.cumulative():
+                add('syncthingui_rest_request_duration_seconds_bucket'
+                    '{path="%s",le="%s"} %d' % (
+                        path, "+Inf" if le == float("inf") else le, count))
+            add('syncthingui_rest_request_duration_seconds_count'
+                '{path="%s"} %d' % (path, hist.count))
+            add('syncthingui_rest_request_duration_seconds_sum'
+                '{path="%s"} %.6f' % (path, hist.sum))
+        buffers = manager.sampler.buffers
+        if len(buffers["rss"]):
+            for name, key, text in (
+                    ("cpu_percent", "cpu", "CPU %"),
+                    ("resident_memory_bytes", "rss", "Resident memory"),
+                    ("read_bytes_per_second", "read", "Disk read rate"),
+                    ("write_bytes_per_second", "write", "Disk write rate"),
+                    ("open_fds", "fds", "Open files"),
+                    ("threads", "threads", "Threads")):
+                family("syncthingui_syncthing_" + name, "gauge",
+                       "Syncthing process tree " + text)
+                add("syncthingui_syncthing_%s %r" % (
+                    name, buffers[key].latest()))
+        add("# EOF\n")
+        self.body = "\n".join(out).encode("utf-8")  # atomic swap
+
+
+def fleet_settings():
+    """remote syncthing nodes to watch, settings array [fleet]"""
+    settings = QSettings()
+    verify = settings.value("fleet/verify", "false") == "true"
+    nodes = []
+    for num in range(settings.beginReadArray("fleet")):
+        settings.setArrayIndex(num)
+        address = str(settings.value("address", "")).rstrip("/")
+        if not address:
+            continue
+        if "://" not in address:
+            address = "https://" + address  # syncthing GUI default
+        nodes.append(dict(name=str(settings.value("name", "") or address),
+                          url=address,
+                          apikey=str(settings.value("apikey", "")),
+                          cafile=str(settings.value("cafile", "")),
+                          fingerprint=str(settings.value("fingerprint", "")),
+                          verify=verify))
+    settings.endArray()
+    return nodes
+
+
+class FleetNode(object):
+    """last known state of one remote syncthing"""
+    __slots__ = ("name", "url", "apikey", "healthy", "version",
+                 "folder_errors", "need_bytes", "last_seen", "latency",
+                 "error", "busy")
+
+    def __init__(self, name, url, apikey):
+        self.name = name
+        self.url = url
+        self.apikey = apikey
+        self.healthy = None  # None: never polled
+        self.version = ""
+        self.folder_errors = 0
+        self.need_bytes = 0
+        self.last_seen = None  # time.time() of last healthy answer
+        self.latency = None  # sec, whole poll
+        self.error = ""
+        self.busy = False  # poll in progress
+
+
+class PinnedHTTPSConnection(HTTPSConnection):
+    """HTTPS connection to the server of one certificate (SHA-256)"""
+    def __init__(self, host, fingerprint, **kwargs):
+        """ construct """
+        super(PinnedHTTPSConnection, self).__init__(host, **kwargs)
+        self.fingerprint = fingerprint
+
+    def connect(self):
+        """connect, fail before any request on another certificate"""
+        super(PinnedHTTPSConnection, self).connect()
+        cert = self.sock.getpeercert(binary_form=True)
+        if hashlib.sha256(cert).hexdigest() != self.fingerprint:
+            self.close()
+            raise ssl.SSLCertVerificationError(
+                1, "certificate fingerprint mismatch")
+
+
+class HostPool(object):
+    """
+    keep-alive http.client connections of one host, a connection is used
+    by one thread at a time
+    """
+    def __init__(self, url, timeout=FLEET_TIMEOUT, cafile="", fingerprint="",
+                 verify=False):
+        """
+        construct, https certificate checked against cafile, a SHA-256
+        fingerprint or the system CAs (verify), else not checked
+        """
+        scheme, _, self.host = url.partition("://")
+        self.https = scheme == "https"
+        self.timeout = timeout
+        self.cafile = cafile
+        self.fingerprint = fingerprint.replace(":", "").replace(
+            " ", "").lower()
+        self.verify = verify
+        self.idle = deque()
+
+    @property
+    def verified(self):
+        """False when the API key may be sent to anyone in the middle"""
+        return not self.https or bool(
+            self.cafile or self.fingerprint or self.verify)
+
+    def _connect(self):
+        """new connection"""
+        if not self.https:
+            return HTTPConnection(self.host, timeout=self.timeout)
+        if self.fingerprint:
+            return PinnedHTTPSConnection(self.host, self.fingerprint,
+                                         timeout=self.timeout,
+                                         context=_gui_context())
+        return HTTPSConnection(self.host, timeout=self.timeout,
+                               context=_gui_context(self.cafile,
+                                                    self.verify))
+
+    def get(self, path, apikey):
+        """GET path, return (status, decoded json or None)"""
+        try:
+            conn = self.idle.popleft()
+        except IndexError:
+            conn = self._connect()
+        try:
+            conn.request("GET", path, headers={"X-API-Key": apikey})
+            resp = conn.getresponse()
+            body = resp.read()
+        except (OSError, HTTPException):
+            conn.close()
+            raise
+        if resp.will_close:
+            conn.close()
+        else:
+            self.idle.append(conn)
+        try:
+            return resp.status, json.loads(body.decode("utf-8") or "null")
+        except ValueError:
+            return resp.status, None
+
+
+class FleetMonitor(QObject):
+    """
+    poll remote syncthing REST endpoints from a bounded thread pool,
+    one keep-alive HostPool per node, results delivered in GUI thread
+    """
+    updated = pyqtSignal(object)  # FleetNode
+
+    def __init__(self, nodes, interval=FLEET_INTERVAL,
+                 concurrency=FLEET_CONCURRENCY, timeout=FLEET_TIMEOUT,
+                 parent=None):
+        """ construct, nodes: fleet_settings() entries """
+        super(FleetMonitor, self).__init__(parent)
+        self.nodes = [FleetNode(node["name"], node["url"], node["apikey"])
+                      for node in nodes]
+        self.pools = {node["url"]: HostPool(
+            node["url"], timeout, node.get("cafile", ""),
+            node.get("fingerprint", ""), node.get("verify", False))
+            for node in nodes}
+        unverified = sum(not pool.verified for pool in self.pools.values())
+        if unverified:
+            print("fleet: TLS certificate of %d nodes not verified (set "
+                  "cafile, fingerprint or fleet/verify)" % unverified)
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(1, concurrency),
+            thread_name_prefix="syncthingui-fleet")
+        self.timer = QTimer(self)
+        self.timer.setInterval(int(interval * 1000))
+        self.timer.timeout.connect(self.poll)
+
+    def start(self):
+        """poll now, then every interval"""
+        self.poll()
+        self.timer.start()
+
+    def stop(self):
+        """stop polling, queued polls are dropped"""
+        self.timer.stop()
+        try:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        except TypeError:  # python < 3.9
+            self.executor.shutdown(wait=False)
+
+    @pyqtSlot()
+    def poll(self):
+        """queue a poll of every node not already being polled"""
+        for node in self.nodes:
+            if not node.busy:
+                node.busy = True
+                self.executor.submit(self._poll_node, node)
+
+    def _poll_node(self, node):
+        """poll one node (pool thread)"""
+        pool = self.pools[node.url]
+        start = time.monotonic()
+        try:
+            status, health = pool.get(HEALTH_PATH, node.apikey)
+            node.healthy = status == 200 and isinstance(health, dict) and \
+                health.get("status") == "OK"
+            if node.healthy:
+                node.error = ""
+                node.last_seen = time.time()
+                self._poll_details(node, pool)
+            elif status == 200:
+                node.error = "health: not a syncthing answer"
+            else:
+                node.error = "health: HTTP %d" % status
+        except (OSError, HTTPException) as reason:
+            node.healthy = False
+            node.error = str(reason) or reason.__class__.__name__
+        except (AttributeError, KeyError, TypeError) as reason:
+            # json of another shape than syncthing's
+            node.error = "unexpected answer: %s" % reason
+        finally:
+            # whatever happened the node is polled again next time
+            node.latency = time.monotonic() - start
+            node.busy = False
+            self.updated.emit(node)  # queued to the GUI thread
+
+    @staticmethod
+    def _poll_details(node, pool):
+        """version, folder errors and bytes needed (API key required)"""
+        status, version = pool.get("/rest/system/version", node.apikey)
+        if status != 200:
+            node.error = "API key missing or wrong (HTTP %d)" % status
+            return
+        node.version = (version or {}).get("version", "")
+        status, folders = pool.get("/rest/config/folders", node.apikey)
+        if status == 404:  # syncthing < 1.12
+            status, config = pool.get("/rest/config", node.apikey)
+            folders = (config or {}).get("folders")
+        errors = need = 0
+        for folder in folders or ():
+            status, data = pool.get("/rest/db/status?folder=" +
+                                    quote(folder["id"]), node.apikey)
+            if status == 200 and data:
+                errors += data.get("errors", 0) + data.get("pullErrors", 0)
+                need += data.get("needBytes", 0)
+        node.folder_errors = errors
+        node.need_bytes = need
+
+
+class FleetWindow(QWidget):
+    """remote syncthing nodes in one sortable table"""
+    COLUMNS = ("Node", "Health", "Version", "Folder errors", "Need",
+               "Last seen", "Latency")
+
+    def __init__(self, monitor, parent=None):
+        """ construct """
+        super(FleetWindow, self).__init__(parent, Qt.Window)
+        self.setWindowTitle("Syncthing fleet")
+        self.resize(900, 500)
+        self.monitor = monitor
+        self.model = QStandardItemModel(0, len(self.COLUMNS), self)
+        self.model.setHorizontalHeaderLabels(self.COLUMNS)
+        # numbers sort as numbers, not as displayed text
+        self.model.setSortRole(Qt.UserRole)
+        view = QTableView(self)
+        view.setModel(self.model)
+        view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        view.setSortingEnabled(True)
+        view.horizontalHeader().setStretchLastSection(True)
+        view.verticalHeader().hide()
+        self.view = view
+        self.info = QLabel(self)
+        layout = QVBoxLayout()
+        layout.addWidget(self.info)
+        layout.addWidget(view)
+        self.setLayout(layout)
+        self.rows = {}  # node url: QStandardItem of the Node column
+        for node in monitor.nodes:
+            items = [QStandardItem() for _ in self.COLUMNS]
+            self.model.appendRow(items)
+            self.rows[node.url] = items[0]
+            self.update_node(node)
+        monitor.updated.connect(self.update_node)
+        # "last seen" age move on its own
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.update_ages)
+        self.timer.start(5000)
+
+    @staticmethod
+    def _set(item, text, key):
+        """display text, sort key"""
+        if item.text() != text:
+            item.setText(text)
+        item.setData(key, Qt.UserRole)
+
+    @pyqtSlot(object)
+    def update_node(self, node):
+        """one node polled"""
+        row = self.rows[node.url].row()
+        item = self.model.item
+        self._set(item(row, 0), node.name, node.name.lower())
+        health = {None: "?", True: "OK", False: "DOWN"}[node.healthy]
+        self._set(item(row, 1), health, health)
+        item(row, 1).setToolTip(node.error or node.url)
+        self._set(item(row, 2), node.version, node.version)
+        self._set(item(row, 3), str(node.folder_errors), node.folder_errors)
+        self._set(item(row, 4), human_bytes(node.need_bytes),
+                  node.need_bytes)
+        self._set(item(row, 6), "" if node.latency is None else
+                  "%.0f ms" % (node.latency * 1000), node.latency or 0.0)
+        self.update_age(row, node)
+        self.update_info()
+
+    def update_age(self, row, node):
+        """time since the node last answered"""
+        if node.last_seen is None:
+            self._set(self.model.item(row, 5), "never", float("inf"))
+        else:
+            age = time.time() - node.last_seen
+            self._set(self.model.item(row, 5), "%.0f sec ago" % age, age)
+
+    def update_ages(self):
+        """refresh every last seen age"""
+        for node in self.monitor.nodes:
+            self.update_age(self.rows[node.url].row(), node)
+
+    def update_info(self):
+        """fleet summary"""
+        nodes = self.monitor.nodes
+        self.info.setText("%d nodes: %d up, %d down, %d folder errors, "
+                          "%s needed" % (
+                              len(nodes),
+                              sum(1 for node in nodes if node.healthy),
+                              sum(1 for node in nodes
+                                  if node.healthy is False),
+                              sum(node.folder_errors for node in nodes),
+                              human_bytes(sum(node.need_bytes
+                                              for node in nodes))))
+
+
+class LineReader(object):
+    """
+    split a byte stream into text lines: utf-8 is decoded incrementally
+    (multi-byte char may be cut between reads) and the unfinished last
+    line is kept until the next feed()
+    """
+    def __init__(self, encoding="utf-8"):
+        """ construct """
+        self.decoder = codecs.getincrementaldecoder(encoding)("replace")
+        self.partial = []  # pieces of the unfinished line
+
+    def feed(self, data):
+        """return complete lines of data (bytes)"""
+        text = self.decoder.decode(data)
+        if "\n" not in text:
+            # long line in many reads: join pieces once, not per read
+            if text:
+                self.partial.append(text)
+            return []
+        lines = text.split("\n")
+        if self.partial:
+            self.partial.append(lines[0])
+            lines[0] = "".join(self.partial)
+            self.partial = []
+        last = lines.pop()
+        if last:
+            self.partial.append(last)
+        return [line[:-1] if line.endswith("\r") else line
+                for line in lines]
+
+    def flush(self):
+        """return what is left at end of stream"""
+        rest = "".join(self.partial) + self.decoder.decode(b"", True)
+        self.partial = []
+        self.decoder.reset()
+        if rest.endswith("\r"):
+            rest = rest[:-1]
+        return [rest] if rest else []
+
+
+class LogStore(object):
+    """
+    bounded syncthing log, each line is parsed once into columns
+    (time, device, level, message offset) that filters run against.
+    Lines are numbered from the first line ever appended.
+    """
+    LEVELS = ("", "DEBUG", "VERBOSE", "INFO", "OK", "WARNING", "ALARM",
+              "FATAL")
+    CHUNK = 4096  # lines joined together for regex search
+    # [DEVICE] 2006/01/02 15:04:05.000000 INFO: message
+    LINE_RE = re.compile(
+        r"(?:\[(?P<device>[A-Z0-9]{5}|start|monitor)\] )?"
+        r"(?:(?P<date>\d{4}/\d\d/\d\d) )?"
+        r"(?:(?P<time>\d\d:\d\d:\d\d)(?:\.\d+)? )?"
+        r"(?:(?P<level>DEBUG|VERBOSE|INFO|OK|WARNING|ALARM|FATAL): )?")
+
+    def __init__(self, capacity=LOG_LINES):
+        """ construct """
+        self.capacity = capacity
+        self.base = 0  # number of the first line kept
+        self.lines = []
+        self.times = array("d")
+        self.devices = array("H")  # index in device_names
+        self.levels = array("B")  # index in LEVELS
+        self.offsets = array("H")  # message start in line
+        self.device_names = [""]
+        self._device_index = {"": 0}
+        self.by_level = dict((level, array("q"))
+                             for level in range(len(self.LEVELS)))
+        # lines joined by CHUNK for regex search, as they are appended:
+        # (first line number, end line number, stream char of text[0], text)
+        self.starts = array("q")  # start char of each line in stream
+        self._chars = 0
+        self._chunks = deque()
+        self._chunk_end = 0  # number of the line after last joined one
+        self._time_cache = {}
+
+    def __len__(self):
+        return len(self.lines)
+
+    @property
+    def end(self):
+        """number of the line after the last one"""
+        return self.base + len(self.lines)
+
+    def _timestamp(self, date, clock):
+        """epoch of syncthing date/time, today when there is no date"""
+        key = (date, clock)
+        stamp = self._time_cache.get(key)
+        if stamp is None:
+            if len(self._time_cache) > 4096:
+                self._time_cache.clear()
+            day = date or time.strftime("%Y/%m/%d")
+            stamp = time.mktime(time.strptime(day + " " + clock,
+                                              "%Y/%m/%d %H:%M:%S"))
+            self._time_cache[key] = stamp
+        return stamp
+
+    def append(self, line):
+        """parse and store one line"""
+        match = self.LINE_RE.match(line)
+        device, date, clock, level = match.group(
+            "device", "date", "time", "level")
+        if clock:
+            stamp = self._timestamp(date, clock)
+        else:
+            stamp = self.times[-1] if self.times else time.time()
+        dev = self._device_index.get(device or "")
+        if dev is None:
+            dev = self._device_index[device] = len(self.device_names)
+            self.device_names.append(device)
+        lvl = self.LEVELS.index(level) if level else 0
+        num = self.end
+        self.lines.append(line)
+        self.times.append(stamp)
+        self.devices.append(dev)
+        self.levels.append(lvl)
+        self.offsets.append(min(match.end(), 65535))
+        self.by_level[lvl].append(num)
+        self.starts.append(self._chars)
+        self._chars += len(line) + 1
+        return num
+
+    def extend(self, lines):
+        """store lines, return number of the first one"""
+        first = self.end
+        for line in lines:
+            self.append(line)
+        while self.end - max(self._chunk_end, self.base) >= self.CHUNK:
+            self._join_chunk()
+        if len(self.lines) > self.capacity + self.capacity // 4:
+            self._trim(len(self.lines) - self.capacity)
+        return first
+
+    def _trim(self, count):
+        """drop count oldest lines, amortized by the capacity slack"""
+        self.base += count
+        for column in (self.lines, self.times, self.devices, self.levels,
+                       self.offsets, self.starts):
+            del column[:count]
+        for nums in self.by_level.values():
+            del nums[:bisect_left(nums, self.base)]
+        while self._chunks and self._chunks[0][1] <= self.base:
+            self._chunks.popleft()
+
+    def _join_chunk(self):
+        """join the next CHUNK lines, each ended by \\n"""
+        first = max(self._chunk_end, self.base)
+        idx = first - self.base
+        self._chunks.append((first, first + self.CHUNK, self.starts[idx],
+                             "\n".join(self.lines[idx:idx + self.CHUNK]) +
+                             "\n"))
+        self._chunk_end = first + self.CHUNK
+
+    def record(self, num):
+        """(time, device, level, message) of line num"""
+        idx = num - self.base
+        return (self.times[idx], self.device_names[self.devices[idx]],
+                self.LEVELS[self.levels[idx]],
+                self.lines[idx][self.offsets[idx]:])
+
+    def line(self, num):
+        """text of line num"""
+        return self.lines[num - self.base]
+
+    def select(self, levels=None, pattern=None, since=None, until=None,
+               start=None, limit=None):
+        """
+        numbers of lines matching all given filters
+        levels: LEVELS index list, pattern: regex (str or compiled),
+        since/until: epoch range, start: first line number to consider
+        limit: only the last matching lines
+        """
+        low, high = max(self.base, start or 0), self.end
+        if since is not None:
+            low = max(low, self.base + bisect_left(self.times, since))
+        if until is not None:
+            high = min(high, self.base + bisect_right(self.times, until))
+        if low >= high:
+            return []
+        wanted = set(levels) if levels else None
+        if pattern is None:
+            if wanted is None:
+                nums = range(low, high)
+            else:
+                nums = list(merge(*[
+                    self.by_level[lvl][
+                        bisect_left(self.by_level[lvl], low):
+                        bisect_left(self.by_level[lvl], high)]
+                    for lvl in wanted]))
+            return list(nums[-limit:] if limit else nums)
+        if isinstance(pattern, str):
+            pattern = re.compile(pattern, re.MULTILINE)
+        nums = []
+        for first, end, origin, text in self._chunks:
+            if first < high and end > low:
+                self._search(nums, pattern, wanted, text, origin,
+                             max(low, first), min(high, end))
+        # last lines, less than a chunk: one by one
+        for num in range(max(low, self._chunk_end), high):
+            idx = num - self.base
+            if (wanted is None or self.levels[idx] in wanted) and \
+                    pattern.search(self.lines[idx]):
+                nums.append(num)
+        return nums[-limit:] if limit else nums
+
+    def _search(self, nums, pattern, wanted, text, origin, low, high):
+        """append to nums lines low..high-1 of chunk text matching"""
+        stop = self.starts[high - self.base - 1] - origin + \
+            len(self.lines[high - self.base - 1])
+        last = -1
+        starts = self.starts
+        pos = self.starts[low - self.base] - origin
+        while True:
+            match = pattern.search(text, pos, stop)
+            if match is None:
+                break
+            idx = bisect_right(starts, match.start() + origin) - 1
+            if idx != last:
+                last = idx
+                if wanted is None or self.levels[idx] in wanted:
+                    nums.append(self.base + idx)
+            # continue at next line, one hit per line is enough
+            nxt = text.find("\n", match.end() if match.end() > pos
+                            else pos, stop)
+            if nxt < 0:
+                break
+            pos = nxt + 1
+
+
+class LogWriter(Thread):
+    """
+    write syncthing output to rotating files in a background thread,
+    write() never block: when the queue is full lines are dropped
+    """
+    def __init__(self, directory, name=LOG_FILE, max_bytes=16 << 20,
+                 backups=5, compress=False):
+        """ construct """
+        super(LogWriter, self).__init__(name="syncthingui-log", daemon=True)
+        self.path = os.path.join(directory, name)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.compress = compress
+        self.queue = queue.Queue(maxsize=4096)  # chunks of lines
+        self.dropped = 0
+        self.file = None
+
+    def write(self, lines):
+        """queue lines to be written"""
+        try:
+            self.queue.put_nowait(lines)
+        except queue.Full:
+            self.dropped += len(lines)
+
+    def stop(self, timeout=2.0):
+        """write what is queued and stop"""
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.join(timeout)
+
+    def _backup(self, num):
+        """path of backup num"""
+        return "%s.%d%s" % (self.path, num, ".gz" if self.compress else "")
+
+    def rotate(self):
+        """syncthing.log -> syncthing.log.1[.gz] -> ... .backups"""
+        self.file.close()
+        for num in range(self.backups - 1, 0, -1):
+            if os.path.exists(self._backup(num)):
+                os.replace(self._backup(num), self._backup(num + 1))
+        if self.backups > 0:
+            if self.compress:
+                with open(self.path, "rb") as src, \
+                        gzip.open(self._backup(1), "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(self.path)
+            else:
+                os.replace(self.path, self._backup(1))
+        # no backups: start the file again, else it grow without bound
+        self.file = open(self.path, "ab" if self.backups > 0 else "wb")
+
+    def run(self):
+        """write loop"""
+        self.file = open(self.path, "ab")
+        self.file.write(time.strftime(
+            "=== syncthingui capture %Y/%m/%d %H:%M:%S ===\n").encode())
+        running = True
+        while running:
+            chunks = [self.queue.get()]
+            # write all what is queued in one go
+            while True:
+                try:
+                    chunks.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in chunks:
+                running = False
+            data = "".join("\n".join(lines) + "\n"
+                           for lines in chunks if lines)
+            if self.dropped:
+                data += "=== syncthingui: %d lines dropped ===\n" % \
+                    self.dropped
+                self.dropped = 0
+            try:
+                self.file.write(data.encode("utf-8", "replace"))
+                self.file.flush()
+                if self.file.tell() >= self.max_bytes:
+                    self.rotate()
+            except OSError as err:
+                print("log capture: %s" % err)
+        self.file.close()
+
+
+class MappedLog(object):
+    """
+    read only view of a (multi-GB) log file through mmap, the line
+    offsets index is built lazily, only as far as lines are asked
+    """
+    def __init__(self, path):
+        """ construct """
+        self.path = path
+        with open(path, "rb") as fd:
+            size = os.fstat(fd.fileno()).st_size
+            self.map = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) \
+                if size else b""
+        self.size = size
+        self.starts = array("q", [0]) if size else array("q")
+        self.complete = not size
+
+    def __len__(self):
+        """lines indexed so far"""
+        return len(self.starts)
+
+    def index_more(self, count=10000):
+        """index count more lines, return number of new lines"""
+        if self.complete:
+            return 0
+        find = self.map.find
+        starts = self.starts
+        pos = starts[-1]
+        before = len(starts)
+        for _ in range(count):
+            pos = find(b"\n", pos) + 1
+            if pos <= 0 or pos >= self.size:
+                self.complete = True
+                break
+            starts.append(pos)
+        return len(starts) - before
+
+    def line(self, num):
+        """text of line num (must be indexed)"""
+        start = self.starts[num]
+        end = self.starts[num + 1] - 1 if num + 1 < len(self.starts) \
+            else self.map.find(b"\n", start)
+        if end < 0:
+            end = self.size
+        return self.map[start:end].decode("utf-8", "replace")
+
+    def close(self):
+        """unmap file"""
+        if self.size:
+            self.map.close()
+
+
+class MappedLogModel(QAbstractListModel):
+    """list model paging MappedLog lines in on demand (fetchMore)"""
+    def __init__(self, log, parent=None):
+        """ construct """
+        super(MappedLogModel, self).__init__(parent)
+        self.log = log
+        self.log.index_more()
+        self.rows = len(log)  # rows announced to views
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.rows
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return self.log.line(index.row())
+        return QVariant()
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and not self.log.complete
+
+    def fetchMore(self, parent):
+        # index first: rows are only announced once they can be read
+        added = self.log.index_more(10000)
+        if added:
+            self.beginInsertRows(QModelIndex(), self.rows,
+                                 self.rows + added - 1)
+            self.rows += added
+            self.endInsertRows()
+
+
+class LogViewer(QWidget):
+    """window to browse a syncthing log capture file"""
+    def __init__(self, path, parent=None):
+        """ construct """
+        super(LogViewer, self).__init__(parent, Qt.Window)
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self.setWindowTitle(os.path.basename(path))
+        self.resize(900, 600)
+        self.log = MappedLog(path)
+        self.model = MappedLogModel(self.log, self)
+        view = QListView(self)
+        view.setUniformItemSizes(True)  # no per row size computing
+        view.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        view.setModel(self.model)
+        self.info = QLabel(self)
+        self.model.rowsInserted.connect(self.update_info)
+        layout = QVBoxLayout()
+        layout.addWidget(view)
+        layout.addWidget(self.info)
+        self.setLayout(layout)
+        self.update_info()
+
+    def update_info(self):
+        """file size and lines indexed"""
+        self.info.setText("%s, %d lines%s" % (
+            human_bytes(self.log.size), len(self.log),
+            "" if self.log.complete else "+ (scroll to read more)"))
+
+    def closeEvent(self, event):
+        """unmap file"""
+        self.log.close()
+        super(LogViewer, self).closeEvent(event)
+
+
+class Console(QPlainTextEdit):
+    """
+    bounded syncthing console, lines are queued in a ring buffer and
+    appended at most once per interval (ms)
+    """
+    def __init__(self, lines=CONSOLE_LINES, interval=50, parent=None):
+        """ construct """
+        super(Console, self).__init__(parent)
+        self.setReadOnly(True)
+        self.setUndoRedoEnabled(False)
+        self.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.setMaximumBlockCount(lines)
+        # lines older than capacity would be dropped by the widget anyway
+        self.pending = deque(maxlen=lines)
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.flush)
+
+    def set_capacity(self, lines):
+        """change number of lines kept"""
+        self.setMaximumBlockCount(lines)
+        self.pending = deque(self.pending, maxlen=lines)
+
+    def append_lines(self, lines):
+        """queue lines, shown on next flush"""
+        self.pending.extend(lines)
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def show_lines(self, lines):
+        """replace content by lines"""
+        self.pending.clear()
+        self.setPlainText("\n".join(lines))
+        bar = self.verticalScrollBar()
+        bar.setValue(bar.maximum())
+
+    @pyqtSlot()
+    def flush(self):
+        """append queued lines in one go"""
+        if not self.pending:
+            return
+        bar = self.verticalScrollBar()
+        # only follow output when user did not scroll up
+        at_bottom = bar.value() >= bar.maximum() - 1
+        text = "\n".join(self.pending)
+        self.pending.clear()
+        self.appendPlainText(text)
+        if at_bottom:
+            bar.setValue(bar.maximum())
+
+
+_IO_THREAD = None
+
+
+def io_thread():
+    """shared thread running network I/O (event long-poll) off GUI thread"""
+    global _IO_THREAD
+    if _IO_THREAD is None:
+        _IO_THREAD = QThread()
+        _IO_THREAD.setObjectName("syncthingui-io")
+        _IO_THREAD.start()
+    return _IO_THREAD
+
+
+_IO_NETWORK = None
+
+
+def io_network():
+    """
+    QNetworkAccessManager shared by the event subscribers of every
+    syncthing instance, must be called in io_thread()
+    """
+    global _IO_NETWORK
+    if _IO_NETWORK is None:
+        _IO_NETWORK = QNetworkAccessManager()
+        _ignore_ssl_errors(_IO_NETWORK)
+    return _IO_NETWORK
+
+
+def io_thread_stop():
+    """stop shared I/O thread"""
+    if _IO_THREAD is not None:
+        _IO_THREAD.quit()
+        _IO_THREAD.wait(2000)
+
+
+class SyncthingEvent(object):
+    """one event from syncthing /rest/events"""
+    __slots__ = ("id", "type", "time", "data")
+
+    def __init__(self, id_, type_, time_, data):
+        self.id = id_
+        self.type = type_
+        self.time = time_
+        self.data = data
+
+    def __repr__(self):
+        return "SyncthingEvent(%s, %s)" % (self.id, self.type)
+
+
+class EventSubscriber(QObject):
+    """
+    long-poll syncthing /rest/events, live in io_thread()
+    received signal is delivered queued to the GUI thread
+    """
+    received = pyqtSignal(object)  # SyncthingEvent
+    connected = pyqtSignal(bool)
+
+    def __init__(self, url=URL, apikey=APIKEY, events=EVENT_TYPES,
+                 timeout=60):
+        """ construct, no parent: will be moveToThread() """
+        super(EventSubscriber, self).__init__()
+        self.url = url
+        self.apikey = apikey
+        self.events = events
+        self.timeout = timeout  # server side long-poll timeout (sec)
+        self.last_id = 0
+        self.nam = None
+        self.timer = None
+        self.reply = None
+        self._active = False
+        self._online = None
+        self._resync = True  # check event id after (re)connect
+        self._delay = 1.0
+
+    @pyqtSlot()
+    def start(self):
+        """start polling, must be invoked in io thread"""
+        if self._active:
+            return
+        if self.nam is None:
+            # create in the thread we live in
+            self.nam = io_network()
+            self.timer = QTimer(self)
+            self.timer.setSingleShot(True)
+            self.timer.timeout.connect(self._poll)
+        self._active = True
+        self._poll()
+
+    @pyqtSlot()
+    def stop(self):
+        """stop polling, must be invoked in io thread"""
+        self._active = False
+        if self.reply is not None:
+            self.reply.abort()
+        if self.nam is not None:
+            # delete in our thread, even when it is about to finish,
+            # the network access manager is shared with other instances
+            self.timer.stop()
+            self.timer.deleteLater()
+            self.nam = self.timer = None
+
+    def _poll(self):
+        """send next long-poll request"""
+        if self._resync:
+            # only ask newest event: syncthing restart reset event id
+            query = "since=0&limit=1&timeout=0"
+        else:
+            query = "since=%d&timeout=%d&events=%s" % (
+                self.last_id, self.timeout, ",".join(self.events))
+        req = QNetworkRequest(QUrl("%s/rest/events?%s" % (self.url, query)))
+        req.setRawHeader(b"X-API-Key", self.apikey.encode("utf-8"))
+        if hasattr(req, "setTransferTimeout"):  # Qt 5.15
+            req.setTransferTimeout((self.timeout + 15) * 1000)
+        self.reply = self.nam.get(req)
+        self.reply.finished.connect(self._poll_done)
+
+    @pyqtSlot(str, str)
+    def set_gui(self, url, apikey):
+        """syncthing GUI moved or API key changed, used from next poll"""
+        self.url = url
+        self.apikey = apikey
+
+    def _set_online(self, online):
+        """emit connected only on change"""
+        if online != self._online:
+            self._online = online
+            self.connected.emit(online)
+
+    @pyqtSlot()
+    def _poll_done(self):
+        """handle long-poll answer"""
+        reply, self.reply = self.reply, None
+        reply.deleteLater()
+        if not self._active:
+            return
+        err = reply.error()
+        body = bytes(reply.readAll())
+        try:
+            events = json.loads(body.decode("utf-8")) if not err else None
+        except ValueError:
+            events = None
+        if events is None:
+            if err == QNetworkReply.AuthenticationRequiredError or \
+                    reply.attribute(
+                        QNetworkRequest.HttpStatusCodeAttribute) == 403:
+                print("events: API key missing or wrong")
+            self._set_online(False)
+            self._resync = True
+            self.timer.start(int(self._delay * 1000))
+            self._delay = min(self._delay * 2, 30.0)
+            return
+        self._set_online(True)
+        self._delay = 1.0
+        if self._resync:
+            self._resync = False
+            newest = events[-1]["id"] if events else 0
+            if newest < self.last_id:
+                print("events: syncthing restarted, reset event id")
+                self.last_id = 0
+        else:
+            for event in events:
+                if event["id"] <= self.last_id:
+                    continue
+                self.last_id = event["id"]
+                self.received.emit(SyncthingEvent(
+                    event["id"], event["type"], event.get("time"),
+                    event.get("data")))
+        self._poll()
+
+
+###############################################################################
+class AnimatedSysTrayIcon(QSystemTrayIcon):
+    """
+    Animated SystemTrayIcon, frames are switched by a QTimer on the GUI
+    thread only while syncthing is busy and the tray icon can be seen
+    """
+    # sec per frame for each activity, idle does not animate
+    PERIODS = {"syncing": 0.25, "scanning": 0.5}
+
+    def __init__(self, icon, period=1.0, parent=None):
+        """ construct """
+        super(AnimatedSysTrayIcon, self).__init__(parent)
+        self._interval = period  # sec per frame of animate_start()
+        self.ani_timer = QTimer(self)
+        self.ani_timer.timeout.connect(self.update_trayicon)
+        self.activity = "idle"
+        self.session_idle = False  # screen saver active
+
+        self.ani_icons = []
+        self.ani_idx = 0
+        self.mainicon = QIcon(icon)
+        self.setIcon(self.mainicon)
+        self._watch_session()
+
+    def _watch_session(self):
+        """pause while the screen saver is active (D-Bus, optional)"""
+        try:
+            from PyQt5.QtDBus import QDBusConnection
+        except ImportError:
+            return  # python3-pyqt5.qtdbus not installed
+        QDBusConnection.sessionBus().connect(
+            "org.freedesktop.ScreenSaver", "/org/freedesktop/ScreenSaver",
+            "org.freedesktop.ScreenSaver", "ActiveChanged",
+            self._screensaver)
+
+    @pyqtSlot(bool)
+    def _screensaver(self, active):
+        """screen saver (de)activated"""
+        self.session_idle = active
+        self._schedule()
+
+    def add_ani_icon(self, QIcon):
+        """add QIcon for animate use"""
+        self.ani_icons.append(QIcon)
+
+    def restore_icon(self):
+        """restore to original icon"""
+        self.ani_idx = 0
+        self.setIcon(self.mainicon)
+
+    def setVisible(self, visible):
+        """no frame switch for a hidden icon"""
+        super(AnimatedSysTrayIcon, self).setVisible(visible)
+        self._schedule()
+
+    def show(self):
+        """ show """
+        self.setVisible(True)
+
+    def hide(self):
+        """ hide """
+        self.setVisible(False)
+
+    def set_activity(self, activity):
+        """animate for "syncing" or "scanning", stop on "idle" """
+        if activity != self.activity:
+            self.activity = activity
+            self._schedule()
+
+    def _schedule(self):
+        """run the frame timer only when the animation can be seen"""
+        period = self.PERIODS.get(self.activity)
+        if (period is None or len(self.ani_icons) < 2 or
+                not self.isVisible() or self.session_idle):
+            if self.ani_timer.isActive():
+                self.ani_timer.stop()
+                self.restore_icon()
+        else:
+            self.ani_timer.start(int(period * 1000))
+
+    @pyqtSlot()
+    def update_trayicon(self):
+        """use ani_icons to loop update trayicon """
+        self.ani_idx = (self.ani_idx + 1) % len(self.ani_icons)
+        self.setIcon(self.ani_icons[self.ani_idx])
+
+    def animate_start(self):
+        """animate until animate_stop(), whatever syncthing is doing"""
+        if len(self.ani_icons) < 2:
+            raise NameError("Too few icons to do animate!!")
+        self.PERIODS = dict(self.PERIODS, manual=self._interval)
+        self.set_activity("manual")
+
+    def animate_stop(self):
+        """stop animate tray icon"""
+        self.set_activity("idle")
+
+
+class SyncthingManager(QObject):
+    """
+    syncthing process management without any widget: start/attach,
+    graceful stop, supervisor, events, resources, log capture and
+    metrics. Used by the main window, the tray only and headless modes
+    """
+    message = pyqtSignal(str, int)  # status text, timeout ms (0: keep)
+    alert = pyqtSignal(str)  # needs the user attention
+    lines = pyqtSignal(list)  # syncthing output lines
+    became_ready = pyqtSignal()
+    folders_changed = pyqtSignal()  # folder_states updated
+    gui_changed = pyqtSignal(str, str)  # GUI url, API key
+
+    def __init__(self, url=None, apikey=APIKEY, name="default", home=None,
+                 index=0, parent=None):
+        """
+        construct, home: syncthing -home directory (None: syncthing
+        default), index: position in the instances, offset the metrics port.
+        url and apikey not given: read from the home config.xml
+        """
+        super(SyncthingManager, self).__init__(parent)
+        # settings and environment win over config.xml
+        self.fixed_url, self.fixed_apikey = url, apikey
+        self.config = SyncthingConfig(home)
+        gui = self.config.read() or {}
+        url = url or gui.get("url") or URL
+        apikey = apikey or gui.get("apikey", "")
+        self.url = url
+        self.name = name
+        self.home = home
+        self.index = index
+        # pid file and log captures of other homes are kept apart
+        self.suffix = "" if home is None else "-" + name
+        self.logdir = cache_dir("logs", *(() if home is None else (name,)))
+        self.rest = RestClient(url, apikey, self)
+        # True when we adopted a syncthing we did not start (eg: systemd)
+        self.attached = False
+        # syncthing answer health check
+        self.ready = False
+        # priority of the syncthing we start, settings: syncthing/smooth_cpu,
+        # syncthing/smooth_hdd
+        settings = QSettings()
+        self.smooth_cpu = settings.value("syncthing/smooth_cpu",
+                                         "true") == "true"
+        self.smooth_hdd = settings.value("syncthing/smooth_hdd",
+                                         "true") == "true"
+        # process
+        self.process = QProcess(self)
+        self.process.error.connect(self._process_failed)
+        # stdout and stderr are read on separate channels
+        self.stdout_reader = LineReader()
+        self.stderr_reader = LineReader()
+        self.process.readyReadStandardOutput.connect(self._process_stdout)
+        self.process.readyReadStandardError.connect(self._process_stderr)
+        self.process.stateChanged.connect(self._process_stateChanged)
+        self.process.finished.connect(self._process_finished)
+        self.process.started.connect(self.write_pidfile)
+        self.pidfile = os.path.join(runtime_dir(), PID_FILE.replace(
+            ".pid", self.suffix + ".pid"))
+        # graceful stop in progress: poll exit, escalate at deadline
+        self.stop_timer = QTimer(self)
+        self.stop_timer.setInterval(100)
+        self.stop_timer.timeout.connect(self._stop_poll)
+        self._stopping = None
+        self._stop_checking = False  # health check of an attached one
+        # wait for syncthing REST/GUI to listen before loading view
+        self.probe = ReadinessProbe(url, parent=self)
+        self.probe.ready.connect(self.syncthing_ready)
+        self.probe.gaveup.connect(self.syncthing_not_ready)
+        # restart crashed or hung syncthing, settings: supervisor/*
+        self.supervisor = Supervisor(url, parent=self,
+                                     **self.supervisor_settings())
+        self.supervisor.restart.connect(self.supervised_restart)
+        self.supervisor.hung.connect(self.syncthing_hung)
+        self.supervisor.gaveup.connect(self.supervisor_gaveup)
+        self.process.started.connect(self.supervisor.started)
+        # syncthing resources usage
+        self.sampler = ResourceSampler(self.tracked_processes, parent=self)
+        # folder x device completion, settings: completion/*
+        self.completion = CompletionAggregator(
+            self.rest, int(settings.value("completion/concurrency",
+                                          COMPLETION_CONCURRENCY)), self)
+        # pushed syncthing events, folder id: state
+        self.folder_states = {}
+        self.events = EventSubscriber(url, apikey)
+        self.events.moveToThread(io_thread())
+        self.events.received.connect(self.syncthing_event)
+        self.events.received.connect(self.completion.syncthing_event)
+        self.gui_changed.connect(self.events.set_gui)
+        self.events.connected.connect(self.events_connected)
+        # optional /metrics, served from a cache
+        self.exporter = None
+        self.start_exporter()
+
+        # capture syncthing output to rotating files
+        self.logwriter = None
+        self.open_logwriter()
+
+        # syncthing --version, probed once in background
+        self.syncthing_version = ""
+        self.version_process = QProcess(self)
+        self.version_process.finished.connect(self._version_done)
+        self.version_process.start(SYNCTHING, ["--version"])
+
+    def show_message(self, text, timeout=0):
+        """status text for the window, if any"""
+        self.message.emit(text, timeout)
+
+    def start_exporter(self):
+        """serve /metrics when enabled in settings"""
+        settings = QSettings()
+        if settings.value("metrics/enabled", "false") != "true":
+            return
+        try:
+            self.exporter = MetricsExporter(
+                self, settings.value("metrics/address", METRICS_ADDRESS),
+                int(settings.value("metrics/port", METRICS_PORT)) +
+                self.index, parent=self)
+        except OSError as reason:
+            print("metrics exporter: %s" % reason)
+            return
+        self.events.received.connect(self.exporter.syncthing_event)
+        self.supervisor.changed.connect(self.exporter.changed)
+        self.sampler.sampled.connect(self.exporter.changed)
+        self.rest.finished.connect(self.exporter.changed)
+        self.process.stateChanged.connect(self.exporter.changed)
+
+    def stop_exporter(self):
+        """stop serving /metrics"""
+        if self.exporter is not None:
+            self.exporter.stop()
+            self.exporter.deleteLater()
+            self.exporter = None
+
+    @staticmethod
+    def supervisor_settings():
+        """Supervisor limits from settings"""
+        settings = QSettings()
+        return dict(
+            max_exits=int(settings.value("supervisor/max_exits", 5)),
+            window=float(settings.value("supervisor/window", 60)),
+            maximum=float(settings.value("supervisor/backoff_max", 60)),
+            interval=float(settings.value("supervisor/probe_interval", 30)),
+            failures=int(settings.value("supervisor/probe_failures", 3)))
+
+    def open_logwriter(self):
+        """start capture of syncthing output, unless disabled"""
+        settings = QSettings()
+        if settings.value("log/enabled", "true") == "true":
+            self.logwriter = LogWriter(
+                self.logdir,
+                max_bytes=int(settings.value("log/max_mb", 16)) << 20,
+                backups=int(settings.value("log/backups", 5)),
+                compress=settings.value("log/compress", "false") == "true")
+            self.logwriter.start()
+
+    def close_log(self):
+        """write pending output to capture file and close it"""
+        if self.logwriter is not None:
+            self.logwriter.stop()
+            self.logwriter = None
+
+    @pyqtSlot()
+    def reload_settings(self):
+        """read settings file again (SIGHUP)"""
+        settings = QSettings()
+        settings.sync()
+        print("reload settings: %s" % settings.fileName())
+        self.smooth_cpu = settings.value("syncthing/smooth_cpu",
+                                         "true") == "true"
+        self.smooth_hdd = settings.value("syncthing/smooth_hdd",
+                                         "true") == "true"
+        self.supervisor.configure(**self.supervisor_settings())
+        self.close_log()
+        self.open_logwriter()
+        self.stop_exporter()
+        self.start_exporter()
+        if self.exporter is not None and self.ready:
+            self.exporter.refresh()
+        self.show_message("Settings reloaded", 5000)
 
-BASE_JS = """var custom_css = document.createElement("style");
-custom_css.textContent = '*{font-family:Oxygen}';
-custom_css.textContent += 'body{background-color:lightgray}';
-custom_css.textContent += '.navbar-fixed-bottom{display:none}';
-document.querySelector("head").appendChild(custom_css);"""
+    @pyqtSlot()
+    def _version_done(self):
+        """syncthing --version answer"""
+        self.syncthing_version = bytes(
+            self.version_process.readAllStandardOutput()).decode(
+                "utf-8", "replace").strip()
+        self.show_message(self.syncthing_version, 5000)
 
+    def syncthing_start(self):
+        """syncthing start"""
+        self.run()
 
-###############################################################################
-class AnimatedSysTrayIcon(QSystemTrayIcon):
-    """Animated SystemTrayIcon"""
-    def __init__(self, icon, period=1.0, parent=None, *args, **kwargs):
-        """ construct """
-        super(AnimatedSysTrayIcon, self).__init__(parent)
-        self.args = args
-        self.kwargs = kwargs
-        # Thread timer
-        self._interval = period  # after this time, the timer will run
-        self.ani_timer = None
-        self.ani_stop = False
-        self.schedule_lock = Lock()
+    def attach_or_run(self):
+        """adopt a healthy running syncthing, only start our own if none"""
+        health_check(self.url, self._attach_or_run)
 
-        self.ani_icons = []
-        self.ani_idx = 0
-        self.mainicon = QIcon(icon)
-        self.setIcon(self.mainicon)
+    def _attach_or_run(self, healthy):
+        """health check answer of attach_or_run()"""
+        if healthy:
+            # restart would force a full rescan of every folder, keep it
+            self.attached = True
+            self.syncthing_ready(0.0)
+        else:
+            self.run()
 
-    def add_ani_icon(self, QIcon):
-        """add QIcon for animate use"""
-        self.ani_icons.append(QIcon)
+    @pyqtSlot()
+    def syncthing_quit(self):
+        """stop syncthing on exit, unless it was adopted at startup"""
+        if self.attached:
+            print("leave attached syncthing running")
+            return
+        self.syncthing_stop_wait()
 
-    def restore_icon(self):
-        """restore to original icon"""
-        self.ani_idx = 0
-        self.setIcon(self.mainicon)
+    def write_pidfile(self):
+        """record pids of the syncthing we started, and its children"""
+        pids = [str(proc.pid) for proc in self.tracked_processes()]
+        if not pids:
+            return
+        try:
+            with open(self.pidfile, "w") as fd:
+                fd.write("\n".join(pids) + "\n")
+        except OSError as err:
+            print("pid file: %s" % err)
 
-    def _run(self):
+    def tracked_processes(self):
         """
-        Run desired callback and then reschedule Timer
-        (if thread is not stopped)
+        syncthing process tree we started: QProcess pid, or the pid file
+        left by a previous syncthingui, plus the monitor children
         """
+        pid = int(self.process.processId())
+        if not pid:
+            try:
+                with open(self.pidfile) as fd:
+                    pid = int(fd.readline() or 0)
+            except (OSError, ValueError):
+                pid = 0
+        proc = own_syncthing(pid) if pid else None
+        if proc is None:
+            return []
         try:
-            self.update_trayicon()
-        except Exception as e:
-            # logging.exception("Exception in running periodic thread")
-            raise("Exception in running periodic thread")
-        finally:
-            with self.schedule_lock:
-                if not self.ani_stop:
-                    self.schedule_timer()
+            return [proc] + proc.children(recursive=True)
+        except psutil.Error:
+            return [proc]
 
-    def update_trayicon(self):
-        """use ani_icons to loop update trayicon """
-        total = len(self.ani_icons)
+    def stop_timeout(self):
+        """seconds to wait for a graceful stop"""
+        return float(QSettings().value("syncthing/stop_timeout",
+                                       STOP_TIMEOUT))
 
-        self.ani_idx = self.ani_idx + 1
-        # print("ani_idx: %s" % self.ani_idx)
-        if self.ani_idx > (total - 1):
-            self.ani_idx = 0
-        icon = self.ani_icons[self.ani_idx]
-        self.setIcon(icon)
+    def _stop_state(self, expected=True):
+        """forget syncthing state before stopping it"""
+        self.attached = False
+        self.ready = False
+        self.probe.stop()
+        if expected:
+            self.supervisor.expect_exit()
+        # no state event from a stopped syncthing
+        self.folder_states.clear()
+        self.folders_changed.emit()
 
-    def animate_start(self):
+    def _remove_pidfile(self):
+        """syncthing is gone"""
+        try:
+            os.remove(self.pidfile)
+        except OSError:
+            pass
+
+    def syncthing_stop(self, then=None, expected=True):
         """
-        Mimics Thread standard start method
+        stop syncthing gracefully without blocking: REST shutdown when
+        the API key is known, else SIGTERM, SIGKILL after stop_timeout.
+        then() is called once syncthing is gone, the supervisor restart
+        it when not expected
         """
-        total = len(self.ani_icons)
-        # print("total: %s" % total)
-        if total < 2:
+        print("try to stop syncthing")
+        procs = self.tracked_processes()
+        running = self.process.state() != QProcess.NotRunning
+        if not (procs or running or self.rest.apikey):
+            if self.attached:
+                # keep using it, state untouched: no second syncthing
+                self.show_message(
+                    "Syncthing not started by %s: API key needed to stop "
+                    "it" % __doc__.strip())
+                return
+            self._stop_state(expected)
+            if then is not None:
+                then()
+            return
+        attached = self.attached
+        self._stop_state(expected)
+        if not (procs or running or attached):
+            if then is not None:
+                then()
+            return
+        if self.rest.apikey:
+            step = "REST shutdown"
+            self.rest.post("/rest/system/shutdown", self._shutdown_done)
+        else:
+            step = "SIGTERM"
+            self._terminate(procs)
+        self.show_message("Stopping Syncthing (%s)..." % step)
+        self._stopping = (time.monotonic(), step, procs, then)
+        self.stop_timer.start()
+
+    def _terminate(self, procs):
+        """SIGTERM to syncthing processes"""
+        self.process.terminate()
+        for proc in procs:
+            try:
+                proc.terminate()
+            except psutil.Error:
+                pass
+
+    def _shutdown_done(self, data):
+        """REST shutdown refused (wrong API key...): fall back to SIGTERM"""
+        if data is not None or self._stopping is None:
+            return
+        start, step, procs, then = self._stopping
+        if procs or self.process.state() != QProcess.NotRunning:
+            self._terminate(procs)
+            self._stopping = (start, "SIGTERM", procs, then)
+            self.show_message("REST shutdown failed, Stopping Syncthing "
+                              "(SIGTERM)...")
+            return
+        # not our process: nothing else can stop it
+        self._stop_failed("REST shutdown failed, Syncthing not stopped")
+
+    def _stop_failed(self, msg):
+        """attached syncthing still running: keep using it"""
+        print(msg)
+        self.show_message(msg)
+        self.stop_timer.stop()
+        self._stopping = None
+        self.attached = True
+        self.probe.start()
+
+    @pyqtSlot()
+    def _stop_poll(self):
+        """check syncthing exit, SIGKILL when the deadline is over"""
+        start, step, procs, then = self._stopping
+        elapsed = time.monotonic() - start
+        alive = []
+        for proc in procs:
+            try:
+                if proc.status() != psutil.STATUS_ZOMBIE:
+                    alive.append(proc)
+            except psutil.Error:
+                pass  # gone
+        attached = not procs and \
+            self.process.state() == QProcess.NotRunning
+        if not attached:
+            if self.process.state() != QProcess.NotRunning:
+                alive.append(self.process)
+        elif elapsed < 1.0:
+            # not our process: give REST shutdown a moment
+            return
+        else:
+            # gone when it stop answering, checked without blocking
+            if not self._stop_checking:
+                self._stop_checking = True
+                health_check(self.url, self._stop_health, 0.5)
+            return
+        if alive and elapsed < self.stop_timeout():
+            return
+        if alive:
+            for proc in alive:
+                try:
+                    proc.kill()
+                except psutil.Error:
+                    pass
+            msg = "Syncthing killed (SIGKILL) after %.1f sec of %s" % (
+                elapsed, step)
+        else:
+            msg = "Syncthing stopped in %.1f sec (%s)" % (elapsed, step)
+        self._stopped(msg)
+
+    def _stop_health(self, healthy):
+        """health answer of an attached syncthing being stopped"""
+        self._stop_checking = False
+        if self._stopping is None:
+            return
+        start, step, procs, then = self._stopping
+        elapsed = time.monotonic() - start
+        if not healthy:
+            self._stopped("Syncthing stopped in %.1f sec (%s)" % (elapsed,
+                                                                  step))
+        elif elapsed >= self.stop_timeout():
+            self._stop_failed("Syncthing still running after %.1f sec of "
+                              "%s" % (elapsed, step))
+
+    def _stopped(self, msg):
+        """syncthing is gone: report it, call then()"""
+        then = self._stopping[3]
+        print(msg)
+        self.show_message(msg)
+        self.stop_timer.stop()
+        self._stopping = None
+        self._remove_pidfile()
+        if then is not None:
+            then()
+
+    def syncthing_stop_wait(self):
+        """stop syncthing gracefully, blocking: used on quit"""
+        print("try to stop syncthing")
+        self._stop_state()
+        self.stop_timer.stop()
+        procs = self.tracked_processes()
+        if not procs and self.process.state() == QProcess.NotRunning:
+            return
+        start = time.monotonic()
+        step = "REST shutdown"
+        if not (self.rest.apikey and
+                rest_post(self.url, "/rest/system/shutdown",
+                          self.rest.apikey)):
+            step = "SIGTERM"
+            self._terminate(procs)
+        alive = psutil.wait_procs(procs, timeout=self.stop_timeout())[1]
+        for proc in alive:
+            try:
+                proc.kill()
+            except psutil.Error:
+                pass
+        killed = bool(alive)
+        if self.process.state() != QProcess.NotRunning:
+            # pid not known as syncthing yet (ionice/chrt before exec,
+            # syncthing.exe): wait for the QProcess itself
+            left = start + self.stop_timeout() - time.monotonic()
+            if not self.process.waitForFinished(max(int(left * 1000), 0)):
+                self.process.kill()
+                killed = True
+        self.process.waitForFinished(1000)
+        self._remove_pidfile()
+        print("Syncthing %s in %.1f sec (%s)" % (
+            "killed" if killed else "stopped", time.monotonic() - start,
+            step))
+
+    def syncthing_restart(self):
+        """restart syncthing, in place through REST when possible"""
+        if self.rest.apikey and self.ready:
+            self.ready = False
+            self.supervisor.unwatch()
+            self.show_message("Restarting Syncthing (REST restart)...")
+            # syncthing answer health until it really restart: wait a bit
+            self.rest.post("/rest/system/restart",
+                           lambda data: QTimer.singleShot(
+                               1000, self.probe.start))
+        else:
+            self.run()
+
+    def syncthing_kill_all(self):
+        """explicit sweep: kill every syncthing of the current user"""
+        self._stop_state()
+        self.stop_timer.stop()
+        self._stopping = None
+        self.process.kill()
+        self._remove_pidfile()
+        uid = os.getuid() if hasattr(os, "getuid") else None
+        killed = 0
+        for proc in psutil.process_iter(["name", "uids"]):
+            if proc.info["name"] != SYNCTHING:
+                continue
+            if uid is not None and proc.info["uids"].real != uid:
+                continue
             try:
-                raise NameError("Too few icons to do animate!!")
-            finally:
-                raise
-        self.schedule_timer()
+                proc.kill()
+                killed += 1
+            except psutil.Error:
+                pass
+        self.show_message("%d Syncthing process killed" % killed)
+
+    def run(self):
+        """Run bitch run!."""
+        if self.attached:
+            # not ours, starting another one would fail to get the port
+            self.show_message(
+                "Syncthing is not managed by %s, stop it first "
+                "(Syncthing > Kill all my Syncthing)" % __doc__.strip())
+            return
+        self.supervisor.reset()
+        # Stop first!
+        self.syncthing_stop(then=self._run)
+
+    @pyqtSlot(str)
+    def supervised_restart(self, reason):
+        """restart crashed or hung syncthing"""
+        msg = "Restarting Syncthing: %s" % reason
+        print(msg)
+        self.show_message(msg)
+        self.syncthing_stop(then=self._run)
+
+    @pyqtSlot(str)
+    def syncthing_hung(self, reason):
+        """syncthing stopped answering, stop it to get it restarted"""
+        msg = "Syncthing hung: %s" % reason
+        print(msg)
+        self.show_message(msg)
+        self.syncthing_stop(expected=False)
+
+    @pyqtSlot(str)
+    def supervisor_gaveup(self, msg):
+        """crash loop, let the user look at it"""
+        print("ERROR: " + msg)
+        self.show_message("ERROR: " + msg)
+        self.alert.emit(msg)
+
+    def _run(self):
+        """start syncthing, once the previous one is gone"""
+        command_to_run_syncthing = []
+        if self.smooth_hdd:
+            command_to_run_syncthing += ["ionice", "--ignore", "--class", "3"]
+        if self.smooth_cpu:
+            command_to_run_syncthing += ["chrt", "--verbose", "--idle", "0"]
+        command_to_run_syncthing += [SYNCTHING, "-no-browser"]
+        env = QProcessEnvironment.systemEnvironment()
+        if self.home is not None:
+            # own home and GUI address, the API key is known from settings;
+            # through the environment, the command line is visible to all
+            command_to_run_syncthing += ["-home", self.home]
+            env.insert("STGUIADDRESS", self.url)
+            if self.rest.apikey:
+                env.insert("STGUIAPIKEY", self.rest.apikey)
+        self.process.setProcessEnvironment(env)
+        print(" ".join(command_to_run_syncthing))
+        # do not block GUI thread, errorOccurred report start failure
+        self.process.start(command_to_run_syncthing[0],
+                           command_to_run_syncthing[1:])
+        self.probe.start()
+
+    @pyqtSlot(float)
+    def syncthing_ready(self, elapsed):
+        """syncthing answer health check"""
+        self.ready = True
+        if self.attached:
+            msg = "Attached to running Syncthing at %s" % self.url
+        else:
+            msg = "Syncthing ready in %.2f sec" % elapsed
+            # monitor has started its child by now
+            self.write_pidfile()
+            self.supervisor.watch()
+            self.sampler.start()
+        print(msg)
+        self.show_message(msg)
+        # config.xml is written by syncthing on first start
+        self.discover()
+        if self.exporter is not None:
+            self.exporter.refresh()
+        if QSettings().value("completion/enabled", "true") == "true":
+            self.completion.refresh()
+        self.events_start()
+        self.became_ready.emit()
 
-    def schedule_timer(self):
+    @pyqtSlot()
+    def events_start(self):
+        """start event subscriber, it keep reconnecting by itself"""
+        if not self.rest.apikey:
+            print("no API key (SYNCTHING_APIKEY), events disabled")
+            return
+        QMetaObject.invokeMethod(self.events, "start", Qt.QueuedConnection)
+
+    @pyqtSlot(bool)
+    def events_connected(self, online):
+        """event long-poll connected or lost (it keep reconnecting)"""
+        self.show_message("Syncthing events %s" % (
+            "connected" if online else "lost, reconnecting..."), 5000)
+
+    @pyqtSlot()
+    def events_stop(self):
+        """stop event subscriber"""
+        QMetaObject.invokeMethod(self.events, "stop", Qt.QueuedConnection)
+
+    def discover(self):
         """
-        Schedules next Timer run
+        GUI url and API key from config.xml, parsed again only when it was
+        modified: on start and ConfigSaved
         """
-        self.ani_timer = Timer(self._interval, self._run,
-                               *self.args, **self.kwargs)
-        self.ani_timer.start()
+        gui = self.config.read()
+        if gui is None:
+            return
+        url = self.fixed_url or gui["url"]
+        apikey = self.fixed_apikey or gui["apikey"]
+        if url == self.url and apikey == self.rest.apikey:
+            return
+        print("Syncthing GUI at %s (%s)" % (url, self.config.path))
+        self.url = url
+        self.rest.url, self.rest.apikey = url, apikey
+        self.probe.url = self.supervisor.url = url
+        self.gui_changed.emit(url, apikey)
 
-    def animate_stop(self):
-        """stop animate tray icon"""
-        with self.schedule_lock:
-            self.ani_stop = True
-            if self.ani_timer is not None:
-                self.ani_timer.cancel()
-        self.restore_icon()
+    @pyqtSlot(object)
+    def syncthing_event(self, event):
+        """keep folder states (GUI thread)"""
+        data = event.data or {}
+        if event.type == "ConfigSaved":
+            self.discover()
+        elif event.type == "StateChanged":
+            self.folder_states[data.get("folder")] = data.get("to")
+            self.folders_changed.emit()
+        elif event.type in ("DeviceConnected", "DeviceDisconnected"):
+            self.show_message("%s: %s" % (
+                event.type, data.get("id", "")[:7]), 5000)
+        elif event.type == "FolderErrors":
+            self.show_message("Folder %s: %d errors" % (
+                data.get("folder"), len(data.get("errors") or ())), 5000)
+
+    @pyqtSlot(float)
+    def syncthing_not_ready(self, elapsed):
+        """syncthing did not answer health check in time"""
+        msg = "ERROR: Syncthing not ready after %.0f sec" % elapsed
+        print(msg)
+        self.show_message(msg)
+
+    @pyqtSlot(int, QProcess.ExitStatus)
+    def _process_finished(self, code, status):
+        """syncthing exit"""
+        print("syncthing exit: %s (%s)" % (code, status))
+        self.ready = False
+        self.probe.stop()
+        if self._stopping is None:
+            self._remove_pidfile()
+        self.supervisor.exited(code if status == QProcess.NormalExit
+                               else "crash (%s)" % code)
+        self._process_stdout()
+        self._process_stderr()
+        self.output_lines(self.stdout_reader.flush() +
+                          self.stderr_reader.flush())
+
+    @pyqtSlot()
+    def _process_failed(self):
+        """Read and return errors."""
+        self.show_message("ERROR:Fail:Syncthing blow up in pieces!")
+        if self.process.state() == QProcess.NotRunning:
+            self.probe.stop()
+        if self.process.error() == QProcess.FailedToStart:
+            # no finished signal for that one
+            self.supervisor.exited("failed to start")
+        print("ERROR:Fail:Syncthing blow up in pieces! Wheres your God now?")
+        self._process_stderr()
+
+    @pyqtSlot()
+    def _process_stdout(self):
+        """syncthing stdout data ready"""
+        data = bytes(self.process.readAllStandardOutput())
+        if data:
+            self.output_lines(self.stdout_reader.feed(data))
+
+    @pyqtSlot()
+    def _process_stderr(self):
+        """syncthing stderr data ready"""
+        data = bytes(self.process.readAllStandardError())
+        if data:
+            self.output_lines(self.stderr_reader.feed(data))
+
+    def output_lines(self, lines):
+        """capture syncthing output lines, pass them to the console"""
+        if not lines:
+            return
+        if self.logwriter is not None:
+            self.logwriter.write(lines)
+        self.lines.emit(lines)
+
+    @pyqtSlot(QProcess.ProcessState)
+    def _process_stateChanged(self, state):
+        """ procress_stateChanged """
+        # TODO handle procress_stateChanged
+        print("procress_stateChanged: %s" % state)
+
+
+class SyncthingTray(AnimatedSysTrayIcon):
+    """
+    tray icon and menu of the SyncthingManager instances, with or without
+    windows: one submenu per instance when there is more than one
+    """
+    def __init__(self, managers, icons, parent=None):
+        """ construct """
+        super(SyncthingTray, self).__init__(icons[0], parent=parent)
+        self.managers = managers
+        self.manager = managers[0]
+        self.windows = {}  # manager: MainWindow
+        # callable(manager) creating the window of an instance on demand
+        self.window_factory = None
+        self.instances = None  # InstancesWindow
+        self.fleet = None  # FleetMonitor of remote nodes, set by main()
+        self.fleet_window = None
+        for icon in icons:
+            self.add_ani_icon(icon)
+
+        self.setToolTip(__doc__.strip().capitalize())
+        self.build_menu()
+        for manager in managers:
+            manager.folders_changed.connect(self.update_folders)
+            manager.completion.changed.connect(self.update_folders)
+            manager.alert.connect(
+                lambda msg, name=manager.name: self.showMessage(
+                    __doc__.strip(), msg if len(self.managers) == 1 else
+                    "%s: %s" % (name, msg), QSystemTrayIcon.Warning))
+
+    @property
+    def window(self):
+        """window of the first instance, if any"""
+        return self.windows.get(self.manager)
+
+    def set_window(self, window):
+        """window built after the tray: add its Show/Hide actions"""
+        self.windows[window.manager] = window
+        self.build_menu()
+
+    def show_window(self, manager):
+        """show the window of an instance, created on demand"""
+        window = self.windows.get(manager)
+        if window is None:
+            window = self.window_factory(manager)
+        window.show_gui()
+
+    def show_instances(self):
+        """all instances in one table"""
+        if self.instances is None:
+            self.instances = InstancesWindow(
+                self.managers, self.show_window
+                if self.window_factory is not None else None)
+        self.instances.show()
+        self.instances.raise_()
+
+    def show_fleet(self):
+        """remote syncthing nodes table"""
+        if self.fleet is None:
+            QMessageBox.information(
+                self.window, __doc__.title(),
+                "No remote Syncthing configured (settings [fleet])")
+            return
+        if self.fleet_window is None:
+            self.fleet_window = FleetWindow(self.fleet)
+        self.fleet_window.show()
+        self.fleet_window.raise_()
+
+    def build_menu(self):
+        """tray context menu"""
+        traymenu = QMenu(self.window)
+        traymenu.addAction(__doc__).setDisabled(True)
+        traymenu.addSeparator()
+        # to test animate
+        # traymenu.addAction("start", lambda: self.animate_start())
+        # traymenu.addAction("stop", lambda: self.animate_stop())
+        # traymenu.addSeparator()
+        if len(self.managers) == 1:
+            self._instance_menu(traymenu, self.manager)
+        else:
+            for manager in self.managers:
+                self._instance_menu(traymenu.addMenu(manager.name), manager)
+            traymenu.addSeparator()
+            traymenu.addAction("Instances", lambda: self.show_instances())
+        if self.fleet is not None:
+            traymenu.addAction("Fleet", lambda: self.show_fleet())
+        traymenu.addSeparator()
+        # traymenu.addAction("Open Web", lambda: open_new_tab(URL))
+        traymenu.addAction("Quit All", lambda: self.app_exit())
+        self.setContextMenu(traymenu)
+        # a tray menu without window has no parent to keep it alive
+        self.traymenu = traymenu
+
+    def _instance_menu(self, menu, manager):
+        """actions on one syncthing instance"""
+        menu.addAction("Stop Sync", lambda: manager.syncthing_stop())
+        menu.addAction("Restart Sync", lambda: manager.syncthing_restart())
+        menu.addSeparator()
+        if manager in self.windows or self.window_factory is not None:
+            menu.addAction("Show", lambda: self.show_window(manager))
+            menu.addAction("Hide", lambda: manager in self.windows and
+                           self.windows[manager].hide())
+        else:
+            menu.addAction("Open in external browser",
+                           lambda: open_new_tab(manager.url))
+            menu.addAction("Diagnostics", lambda: DiagnosticsPanel(
+                manager.supervisor).show())
+            menu.addAction("Resources", lambda: ResourceWindow(
+                manager.sampler).show())
+
+    @pyqtSlot()
+    def update_folders(self):
+        """summarize folder states in tooltip, animate while busy"""
+        lines = [__doc__.strip().capitalize()]
+        busy = set()
+        for manager in self.managers:
+            count = folder_counts(manager.folder_states)
+            summary = ", ".join("%d %s" % (num, state)
+                                for state, num in sorted(count.items()))
+            if len(self.managers) > 1:
+                summary = "%s: %s" % (manager.name, summary or "-")
+            if summary:
+                lines.append(summary)
+            synced, pending, devices, need = manager.completion.summary()
+            if devices:
+                lines.append("%d/%d devices up to date, %s to sync%s" % (
+                    synced, devices, human_bytes(need),
+                    ", %d pending" % pending if pending else ""))
+            busy.update(count)
+        self.setToolTip("\n".join(lines))
+        if busy & {"syncing", "sync-preparing", "sync-waiting"}:
+            self.set_activity("syncing")
+        elif busy & {"scanning", "scan-waiting"}:
+            self.set_activity("scanning")
+        else:
+            self.set_activity("idle")
+
+    def app_exit(self):
+        """exit app"""
+        # TODO: show QMessageBox on all virtual desktop
+        the_conditional_is_true = QMessageBox.question(
+            self.window, __doc__.title(), 'Quit %s?' % __doc__,
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.No) == QMessageBox.Yes
+        if the_conditional_is_true:
+            # aboutToQuit stop syncthing
+            QApplication.instance().quit()
+
+
+def folder_counts(folder_states):
+    """number of folders per state"""
+    count = {}
+    for state in folder_states.values():
+        count[state] = count.get(state, 0) + 1
+    return count
+
+
+class InstancesWindow(QWidget):
+    """every syncthing instance state in one table"""
+    COLUMNS = ("Instance", "Address", "Home", "State", "Folders", "PID",
+               "Restarts")
+
+    def __init__(self, managers, activate=None, parent=None):
+        """ construct, activate(manager) on double click """
+        super(InstancesWindow, self).__init__(parent, Qt.Window)
+        self.setWindowTitle("Syncthing instances")
+        self.resize(800, 300)
+        self.managers = managers
+        self.activate = activate
+        self.model = QStandardItemModel(len(managers), len(self.COLUMNS),
+                                        self)
+        self.model.setHorizontalHeaderLabels(self.COLUMNS)
+        view = QTableView(self)
+        view.setModel(self.model)
+        view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        view.horizontalHeader().setStretchLastSection(True)
+        view.verticalHeader().hide()
+        view.doubleClicked.connect(self._activated)
+        layout = QVBoxLayout()
+        layout.addWidget(view)
+        self.setLayout(layout)
+        # coalesce the updates of every instance
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(500)
+        self.timer.timeout.connect(self.update_table)
+        for manager in managers:
+            manager.folders_changed.connect(self.changed)
+            manager.became_ready.connect(self.changed)
+            manager.supervisor.changed.connect(self.changed)
+            manager.process.stateChanged.connect(self.changed)
+        self.update_table()
+
+    @pyqtSlot()
+    def changed(self):
+        """an instance changed, update soon if shown"""
+        if self.isVisible() and not self.timer.isActive():
+            self.timer.start()
+
+    def showEvent(self, event):
+        """up to date when shown"""
+        self.update_table()
+        super(InstancesWindow, self).showEvent(event)
+
+    def update_table(self):
+        """one row per instance"""
+        for row, manager in enumerate(self.managers):
+            if manager.ready:
+                state = "attached" if manager.attached else "running"
+            elif manager.process.state() != QProcess.NotRunning:
+                state = "starting"
+            else:
+                state = "stopped"
+            count = folder_counts(manager.folder_states)
+            values = (manager.name, manager.url, manager.home or "(default)",
+                      state, ", ".join("%d %s" % (num, folder_state) for
+                                       folder_state, num in
+                                       sorted(count.items())),
+                      str(manager.process.processId() or ""),
+                      str(manager.supervisor.restarts))
+            for column, value in enumerate(values):
+                item = self.model.item(row, column)
+                if item is None:
+                    self.model.setItem(row, column, QStandardItem(value))
+                elif item.text() != value:
+                    item.setText(value)
+
+    def _activated(self, index):
+        """show the instance window"""
+        if self.activate is not None:
+            self.activate(self.managers[index.row()])
 
 
 class MainWindow(QMainWindow):
 
     """Main window class."""
 
-    def __init__(self):
-        """Init class."""
+    def __init__(self, manager, icons, dashboard=False):
+        """Init class, dashboard: native view instead of the Web UI"""
         super(MainWindow, self).__init__()
-        self.pixmap_syncthingui = QPixmap(":/images/syncthingui.svg")
-        tf = QTransform()
-        self.pixmap_syncthingui0 = QPixmap(":/images/syncthingui.svg")
-        tf.rotate(90.0)
-        self.pixmap_syncthingui1 = self.pixmap_syncthingui0.transformed(tf)
-        tf.rotate(180.0)
-        self.pixmap_syncthingui2 = self.pixmap_syncthingui0.transformed(tf)
-        tf.rotate(270.0)
-        self.pixmap_syncthingui3 = self.pixmap_syncthingui0.transformed(tf)
-
-        self.init_gui()
+        self.manager = manager
+        self.rest = manager.rest
+        self.icons = icons
+        # Web UI view and native dashboard, created on demand
+        self.view = None
+        self.dashboard = None
+        self.completion = None
+        # web view loaded
+        self.view_loaded = False
+        self.load_started = time.monotonic()
+        self.title_pending = False  # Web UI ready when it set its title
+        self.dashboard_mode = dashboard
+        self.startup_timing = False  # print timing again when view created
+        self.tray = None  # set by main()
+        # Web UI lifecycle while hidden, (zoom, scroll, current) kept when
+        # the page is discarded
+        self.hidden_policy = WEBUI_HIDDEN
+        self.view_state = None
+        self.hidden_timer = QTimer(self)
+        self.hidden_timer.setSingleShot(True)
+        self.hidden_timer.timeout.connect(self.view_sleep)
+        self.view_settings()
+
+        now = time.monotonic()
+        self.init_gui(dashboard)
+        now = startup_phase("init_gui", now)
         self.init_menu()
-        self.init_systray()
+        startup_phase("init_menu", now)
+        manager.message.connect(self.statusBar().showMessage)
+        manager.lines.connect(self.console_lines)
+        manager.became_ready.connect(self.syncthing_ready)
+        manager.gui_changed.connect(self.gui_moved)
+        manager.events.received.connect(self.syncthing_event)
+        if manager.ready:  # attached before the window was built
+            self.syncthing_ready()
 
-        self.run()
-        self.view.show()
+    @property
+    def ready(self):
+        """syncthing answer health check"""
+        return self.manager.ready
+
+    @pyqtSlot()
+    def reload_settings(self):
+        """console settings changed (SIGHUP)"""
+        settings = QSettings()
+        self.consoletextedit.set_capacity(
+            int(settings.value("console/lines", CONSOLE_LINES)))
+        self.logstore.capacity = int(settings.value("console/buffer",
+                                                    LOG_LINES))
+        self.chrt.setChecked(self.manager.smooth_cpu)
+        self.ionice.setChecked(self.manager.smooth_hdd)
+        self.view_settings()
+
+    def view_settings(self):
+        """read the hidden Web UI policy"""
+        settings = QSettings()
+        policy = str(settings.value("webui/hidden", WEBUI_HIDDEN)).lower()
+        if policy not in ("keep", "freeze", "discard"):
+            print("webui/hidden: unknown policy %s, use %s" % (
+                policy, WEBUI_HIDDEN))
+            policy = WEBUI_HIDDEN
+        self.hidden_policy = policy
+        self.hidden_timer.setInterval(int(1000 * float(
+            settings.value("webui/hidden_delay", WEBUI_HIDDEN_DELAY))))
+        if _WEBENGINE_PROFILE is not None:  # applied on next load
+            webui_scripts(_WEBENGINE_PROFILE.scripts())
 
-    def init_gui(self):
+    def init_gui(self, dashboard=False):
         """init gui setup"""
-        self.setWindowIcon(QIcon(self.pixmap_syncthingui))
+        self.setWindowIcon(self.icons[0])
 
         self.progressbar = QProgressBar()
-        self.statusBar().showMessage(getoutput(SYNCTHING + ' --version'))
         self.statusBar().addPermanentWidget(self.progressbar)
-        self.setWindowTitle("%s (%s)" % (__doc__.strip().capitalize(), __version__))
+        # syncthing cpu and memory, click for all resources
+        self.resource_charts = []
+        for name in ("cpu", "rss"):
+            chart = Sparkline(self.manager.sampler.buffers[name],
+                              parent=self)
+            chart.setToolTip("Syncthing %s, click for details" %
+                             ResourceWindow.LABELS[name])
+            chart.clicked.connect(self.show_resources)
+            self.statusBar().addPermanentWidget(chart)
+            self.resource_charts.append(chart)
+        self.manager.sampler.sampled.connect(self.update_resource_tips)
+        self.setWindowTitle("%s (%s)%s" % (
+            __doc__.strip().capitalize(), __version__,
+            "" if self.manager.home is None else " - " + self.manager.name))
         self.setMinimumSize(900, 600)
         self.setMaximumSize(1280, 1024)
         self.resize(self.minimumSize())
         self.center()
 
-        # QWebView
-        # self.view = QWebView(self)
-        self.view = QWebEngineView(self)
-        self.view.loadStarted.connect(self.start_loading)
-        self.view.loadFinished.connect(self.finish_loading)
-        self.view.loadProgress.connect(self.loading)
-        self.view.titleChanged.connect(self.set_title)
-        self.view.page().linkHovered.connect(
-            lambda link_txt: self.statusBar().showMessage(link_txt[:99], 3000))
-        QShortcut("Ctrl++", self, activated=lambda:
-                  self.view.setZoomFactor(self.view.zoomFactor() + 0.2))
-        QShortcut("Ctrl+-", self, activated=lambda:
-                  self.view.setZoomFactor(self.view.zoomFactor() - 0.2))
-        QShortcut("Ctrl+0", self, activated=lambda: self.view.setZoomFactor(1))
+        # Web UI (created when the window is first shown) or native dashboard
+        self.stack = QStackedWidget(self)
+        if dashboard:
+            self.show_dashboard()
+        QShortcut("Ctrl++", self, activated=lambda: self.zoom(0.2))
+        QShortcut("Ctrl+-", self, activated=lambda: self.zoom(-0.2))
+        QShortcut("Ctrl+0", self, activated=lambda: self.zoom(factor=1))
         QShortcut("Ctrl+q", self, activated=lambda: self.close())
 
         # syncthing console
@@ -237,9 +3921,36 @@ class MainWindow(QMainWindow):
         # self.consoletextedit = QPlainTextEdit(parent=self.consolewidget)
         self.consoletoolbar = QWidget(self)
         hlayout = QHBoxLayout()
+        hlayout.setContentsMargins(0, 0, 0, 0)
         self.consoletoolbar.setLayout(hlayout)
-        self.consoletextedit = QTextEdit(parent=self.consolewidget)
-        self.consoletextedit.setWordWrapMode(QTextOption.NoWrap)
+        # filter parsed log: minimum level, time range, regex
+        self.log_filter = None
+        self.level_combo = QComboBox(self.consoletoolbar)
+        self.level_combo.addItem("All levels")
+        for level in LogStore.LEVELS[1:]:
+            self.level_combo.addItem(level + "+")
+        self.since_combo = QComboBox(self.consoletoolbar)
+        for label, seconds in (("All time", None), ("Last 5 min", 300),
+                               ("Last hour", 3600), ("Last day", 86400)):
+            self.since_combo.addItem(label, seconds)
+        self.search_edit = QLineEdit(self.consoletoolbar)
+        self.search_edit.setPlaceholderText("Search (regex)")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.returnPressed.connect(self.apply_log_filter)
+        self.level_combo.activated.connect(self.apply_log_filter)
+        self.since_combo.activated.connect(self.apply_log_filter)
+        clear_button = QPushButton("Live", self.consoletoolbar)
+        clear_button.setToolTip("Clear filter, follow syncthing output")
+        clear_button.clicked.connect(self.clear_log_filter)
+        hlayout.addWidget(self.level_combo)
+        hlayout.addWidget(self.since_combo)
+        hlayout.addWidget(self.search_edit, 1)
+        hlayout.addWidget(clear_button)
+        self.consoletextedit = Console(
+            int(QSettings().value("console/lines", CONSOLE_LINES)),
+            parent=self.consolewidget)
+        self.logstore = LogStore(
+            int(QSettings().value("console/buffer", LOG_LINES)))
         # self.consoletextedit.setStyleSheet(" border:1px solid rgb(0, 0, 0);")
         # self.consoletextedit.setStyleSheet("margin:0px; padding: 0px;")
         layout = QVBoxLayout()
@@ -249,83 +3960,139 @@ class MainWindow(QMainWindow):
         self.consolewidget.setLayout(layout)
 
         self.splitter = QSplitter(Qt.Vertical)
-        self.splitter.addWidget(self.view)
+        self.splitter.addWidget(self.stack)
         self.splitter.addWidget(self.consolewidget)
 
-        # process
-        self.process = QProcess()
-        self.process.error.connect(self._process_failed)
-        # QProcess emits `readyRead` when there is data to be read
-        self.process.readyRead.connect(self._process_dataReady)
-        self.process.stateChanged.connect(self._process_stateChanged)
-        # Just to prevent accidentally running multiple times
-    # Disable the button when process starts, and enable it when it finishes
-    # self.process.started.connect(lambda: self.runButton.setEnabled(False))
-    # self.process.finished.connect(lambda: self.runButton.setEnabled(True))
-
-        # backend options
-        self.chrt = QCheckBox("Smooth CPU ", checked=True)
-        self.ionice = QCheckBox("Smooth HDD ", checked=True)
-        self.chrt.setToolTip("Use Smooth CPUs priority (recommended)")
-        self.ionice.setToolTip("Use Smooth HDDs priority (recommended)")
-        self.chrt.setStatusTip(self.chrt.toolTip())
-        self.ionice.setStatusTip(self.ionice.toolTip())
         # main toolbar
         self.toolbar = self.addToolBar("SyncthinGUI Toolbar")
         # self.toolbar.addAction(QIcon.fromTheme("media-playback-stop"),
         self.toolbar.addAction(QIcon(":/images/stop.svg"),
-                               "Stop Sync", lambda: self.syncthing_stop())
+                               "Stop Sync",
+                               lambda: self.manager.syncthing_stop())
         # self.toolbar.addAction(QIcon.fromTheme("media-playback-start"),
         self.toolbar.addAction(QIcon(":/images/start.svg"),
-                               "Restart Sync", lambda: self.run())
+                               "Restart Sync",
+                               lambda: self.manager.syncthing_restart())
         self.toolbar.addSeparator()
+        # backend options, used on next syncthing start
+        self.chrt = QCheckBox("Smooth CPU ", checked=self.manager.smooth_cpu)
+        self.ionice = QCheckBox("Smooth HDD ",
+                                checked=self.manager.smooth_hdd)
+        self.chrt.setToolTip("Use Smooth CPUs priority (recommended)")
+        self.ionice.setToolTip("Use Smooth HDDs priority (recommended)")
+        self.chrt.setStatusTip(self.chrt.toolTip())
+        self.ionice.setStatusTip(self.ionice.toolTip())
+        self.chrt.toggled.connect(
+            lambda checked: setattr(self.manager, "smooth_cpu", checked))
+        self.ionice.toggled.connect(
+            lambda checked: setattr(self.manager, "smooth_hdd", checked))
         self.toolbar.addWidget(self.chrt)
         self.toolbar.addWidget(self.ionice)
-        self.toolbar.addSeparator()
-        # TODO: test event API
-        self.toolbar.addAction(QIcon(":/images/start.svg"),
-                               "test ", lambda: self.test())
 
         # final gui setup
         self.setCentralWidget(self.splitter)
 
-    def test(self):
-        """ test some function """
-        print("test")
+    def create_view(self):
+        """create the Web UI view, import QtWebEngine on first use"""
+        now = time.monotonic()
+        QWebEngineView = load_webengine()
+        if QWebEngineView is None:
+            self.statusBar().showMessage("QtWebEngine not installed")
+            return None
+        # QWebView
+        # self.view = QWebView(self)
+        self.view = QWebEngineView(self)
+        self.view.setPage(webui_page(self.manager, self.view))
+        self.view.loadStarted.connect(self.start_loading)
+        self.view.loadFinished.connect(self.finish_loading)
+        self.view.loadProgress.connect(self.loading)
+        self.view.titleChanged.connect(self.set_title)
+        self.view.page().linkHovered.connect(
+            lambda link_txt: self.statusBar().showMessage(link_txt[:99], 3000))
+        self.stack.addWidget(self.view)
+        startup_phase("webengine", now)
+        if self.startup_timing:
+            startup_report()
+        return self.view
+
+    def show_webui(self):
+        """switch to the (on demand created) Web UI view"""
+        if self.view is None and self.create_view() is None:
+            return
+        self.stack.setCurrentWidget(self.view)
+        self.load_view()
+
+    def show_dashboard(self):
+        """switch to the (on demand created) native dashboard"""
+        if self.dashboard is None:
+            self.dashboard = Dashboard(self.rest, self)
+            self.stack.addWidget(self.dashboard)
+            if self.ready:
+                self.dashboard.refresh()
+        self.stack.setCurrentWidget(self.dashboard)
+
+    def show_completion(self):
+        """switch to the (on demand created) folder x device completion"""
+        if self.completion is None:
+            self.completion = QTableView(self)
+            self.completion.setModel(CompletionModel(self.manager.completion,
+                                                     self.completion))
+            self.completion.setEditTriggers(QAbstractItemView.NoEditTriggers)
+            self.stack.addWidget(self.completion)
+            if self.ready and self.manager.completion.sweep_start is None:
+                self.manager.completion.refresh()  # completion/enabled off
+        self.stack.setCurrentWidget(self.completion)
+
+    def zoom(self, delta=0.0, factor=None):
+        """zoom Web UI view"""
+        if self.view is None:
+            return
+        if factor is None:
+            factor = self.view.zoomFactor() + delta
+        self.view.setZoomFactor(factor)
 
     def init_menu(self):
         """init menu setup"""
         # file menu
         file_menu = self.menuBar().addMenu("File")
+        file_menu.addAction("Open Syncthing log...", lambda: self.open_log())
         # TODO: setting menu item
         file_menu.addAction("Exit", lambda: self.close())
         # Syncthing menu
         sync_menu = self.menuBar().addMenu("Syncthing")
-        sync_menu.addAction("Start Syncronization", lambda: self.run())
+        sync_menu.addAction("Start Syncronization",
+                            lambda: self.manager.run())
         sync_menu.addAction("Stop Syncronization",
-                            lambda: self.syncthing_stop())
+                            lambda: self.manager.syncthing_stop())
+        sync_menu.addAction("Restart Syncronization",
+                            lambda: self.manager.syncthing_restart())
+        sync_menu.addAction("Kill all my Syncthing",
+                            lambda: self.syncthing_kill_all())
         # TODO: restart
         # TODO: reflash F5
         sync_menu.addAction("Open in external browser",
-                            lambda: open_new_tab(URL))
+                            lambda: open_new_tab(self.manager.url))
 
         # view menu
         view_menu = self.menuBar().addMenu("View")
+        view_menu.addAction("Dashboard", lambda: self.show_dashboard())
+        view_menu.addAction("Completion", lambda: self.show_completion())
+        view_menu.addAction("Web UI", lambda: self.show_webui())
+        view_menu.addAction("Diagnostics", lambda: self.show_diagnostics())
+        view_menu.addAction("Resources", lambda: self.show_resources())
+        view_menu.addAction("Fleet", lambda: self.tray.show_fleet())
+        view_menu.addSeparator()
         # TODO: syncthing console menu
         view_menu.addAction("syncthing console", lambda: self.show_console)
         #
         zoom_menu = view_menu.addMenu("Zoom browser")
-        zoom_menu.addAction(
-            "Zoom In",
-            lambda: self.view.setZoomFactor(self.view.zoomFactor() + .2))
-        zoom_menu.addAction(
-            "Zoom Out",
-            lambda: self.view.setZoomFactor(self.view.zoomFactor() - .2))
+        zoom_menu.addAction("Zoom In", lambda: self.zoom(.2))
+        zoom_menu.addAction("Zoom Out", lambda: self.zoom(-.2))
         zoom_menu.addAction(
             "Zoom To...",
-            lambda: self.view.setZoomFactor(QInputDialog.getInt(
+            lambda: self.zoom(factor=QInputDialog.getInt(
                 self, __doc__, "<b>Zoom factor ?:", 1, 1, 9)[0]))
-        zoom_menu.addAction("Zoom Reset", lambda: self.view.setZoomFactor(1))
+        zoom_menu.addAction("Zoom Reset", lambda: self.zoom(factor=1))
         view_menu.addSeparator()
         act = view_menu.addAction("View Page Source",
                                   lambda: self.view_syncthing_source)
@@ -370,7 +4137,9 @@ class MainWindow(QMainWindow):
         help_menu.addAction("About Python 3",
                             lambda: open_new_tab('https://www.python.org'))
         help_menu.addAction("About " + __doc__,
-                            lambda: QMessageBox.about(self, __doc__, HELPMSG))
+                            lambda: QMessageBox.about(
+                                self, __doc__,
+                                HELPMSG + self.manager.syncthing_version))
         help_menu.addSeparator()
         help_menu.addAction("Keyboard Shortcuts", lambda:
                             QMessageBox.information(self, __doc__, SHORTCUTS))
@@ -380,102 +4149,213 @@ class MainWindow(QMainWindow):
         help_menu.addSeparator()
         help_menu.addAction("Check Updates", lambda: self.check_for_updates())
 
-    def init_systray(self):
-        """init system tray icon"""
-        # self.tray = QSystemTrayIcon(QIcon(self.pixmap_syncthingui), self)
-        self.tray = AnimatedSysTrayIcon(QIcon(self.pixmap_syncthingui), self)
-        self.tray.add_ani_icon(QIcon(self.pixmap_syncthingui0))
-        self.tray.add_ani_icon(QIcon(self.pixmap_syncthingui1))
-        self.tray.add_ani_icon(QIcon(self.pixmap_syncthingui2))
-        self.tray.add_ani_icon(QIcon(self.pixmap_syncthingui3))
-
-        self.tray.setToolTip(__doc__.strip().capitalize())
-        traymenu = QMenu(self)
-        traymenu.addAction(__doc__).setDisabled(True)
-        traymenu.addSeparator()
-        # to test animate
-        # traymenu.addAction("start", lambda: self.tray.animate_start())
-        # traymenu.addAction("stop", lambda: self.tray.animate_stop())
-        # traymenu.addSeparator()
-        traymenu.addAction("Stop Sync", lambda: self.syncthing_stop())
-        traymenu.addAction("Restart Sync", lambda: self.run())
-        traymenu.addSeparator()
-        traymenu.addAction("Show", lambda: self.show_gui())
-        traymenu.addAction("Hide", lambda: self.hide())
-        traymenu.addSeparator()
-        # traymenu.addAction("Open Web", lambda: open_new_tab(URL))
-        # traymenu.addAction("Quit All", lambda: self.close())
-        traymenu.addAction("Quit All", lambda: self.app_exit())
-        self.tray.setContextMenu(traymenu)
-        self.tray.show()
+    def open_log(self, path=None):
+        """browse a syncthing log capture"""
+        if path is None:
+            path = QFileDialog.getOpenFileName(
+                self, "Open Syncthing log", self.manager.logdir,
+                "Logs (*.log *.log.*);;All files (*)")[0]
+        if not path:
+            return
+        if path.endswith(".gz"):
+            QMessageBox.information(self, __doc__, "Compressed capture, "
+                                    "gunzip it to browse it.")
+            return
+        viewer = LogViewer(path, self)
+        viewer.show()
+
+    def show_resources(self):
+        """show syncthing resource usage history"""
+        ResourceWindow(self.manager.sampler, self).show()
+
+    @pyqtSlot()
+    def update_resource_tips(self):
+        """redraw status bar sparklines with the last values"""
+        for chart, name in zip(self.resource_charts, ("cpu", "rss")):
+            chart.setToolTip("Syncthing %s: %s, click for details" % (
+                ResourceWindow.LABELS[name],
+                resource_text(name,
+                              self.manager.sampler.buffers[name].latest())))
+            chart.update()
+
+    def show_diagnostics(self):
+        """show syncthing restarts and liveness probe latency"""
+        DiagnosticsPanel(self.manager.supervisor, self).show()
 
     def show_gui(self):
         """
         Helper method to show UI, this should not be needed, but I discovered.
         """
         self.showNormal()
-        # webview require 70Mb to show webpage
-        self.view.load(QUrl(URL))
+        if not self.dashboard_mode and self.view is None:
+            self.show_webui()
+        else:
+            self.load_view()
 
-    def syncthing_start(self):
-        """syncthing start"""
-        self.run()
+    def hideEvent(self, event):
+        """hidden to the tray: freeze or discard the Web UI later"""
+        if self.view is not None and self.hidden_policy != "keep":
+            self.hidden_timer.start()
+        super(MainWindow, self).hideEvent(event)
 
-    def syncthing_stop(self):
-        """syncthing stop"""
-        print("try to stop syncthing")
-        self.process.kill()
-        # check there is no other syncthing is running!
-        for proc in psutil.process_iter():
-            # check whether the process name matches
-            # print("procress: %s " % proc.name())
-            if proc.name() == SYNCTHING:
-                proc.kill()
+    def showEvent(self, event):
+        """shown again: bring back the Web UI"""
+        self.hidden_timer.stop()
+        super(MainWindow, self).showEvent(event)
+        self.view_wake()
 
-    def run(self):
-        """Run bitch run!."""
-        # Stop first!
-        self.syncthing_stop()
+    def view_sleep(self):
+        """apply the hidden policy to the Web UI page"""
+        if self.view is None or self.isVisible():
+            return
+        page = self.view.page()
+        before = webengine_rss()
+        if not hasattr(page, "setLifecycleState"):
+            # Qt < 5.14: no frozen state, a discard destroy the view
+            if self.hidden_policy != "discard":
+                return
+            self.view_state = (self.view.zoomFactor(), page.scrollPosition(),
+                               self.stack.currentWidget() is self.view)
+            self.stack.removeWidget(self.view)
+            self.view.deleteLater()
+            self.view = None
+            self.view_loaded = False
+        elif self.hidden_policy == "discard":
+            if page.lifecycleState() == page.Discarded:
+                return
+            self.view_state = (self.view.zoomFactor(), page.scrollPosition(),
+                               self.stack.currentWidget() is self.view)
+            page.setLifecycleState(page.Discarded)
+        elif page.lifecycleState() == page.Active:
+            page.setLifecycleState(page.Frozen)
+        else:
+            return
+        print("Web UI %s, renderer RSS %s" % (self.hidden_policy,
+                                              human_bytes(before)))
+        # the renderer exit or trim its memory a bit later
+        QTimer.singleShot(2000, lambda: self._view_sleep_done(before))
+
+    def _view_sleep_done(self, before):
+        """report the renderer memory released by the hidden policy"""
+        after = webengine_rss()
+        print("Web UI %s: renderer RSS %s -> %s" % (
+            self.hidden_policy, human_bytes(before), human_bytes(after)))
+        self.statusBar().showMessage(
+            "Web UI %s while hidden, %s released" % (
+                self.hidden_policy, human_bytes(max(0, before - after))),
+            5000)
 
-        command_to_run_syncthing = " ".join((
-            "ionice --ignore --class 3" if self.ionice.isChecked() else "",
-            "chrt --verbose --idle 0" if self.chrt.isChecked() else "",
-            SYNCTHING, "-no-browser"))
-        print(command_to_run_syncthing)
-        self.process.start(command_to_run_syncthing)
-        if not self.process.waitForStarted():
-            self._process_failed()
+    def view_wake(self):
+        """restore the frozen or discarded Web UI, zoom and scroll kept"""
+        if self.view is None:
+            if self.view_state is not None and self.view_state[2]:
+                self.show_webui()  # view destroyed, load it again
+            return
+        page = self.view.page()
+        if (hasattr(page, "setLifecycleState") and
+                page.lifecycleState() != page.Active):
+            # a discarded page reload, state restored by finish_loading
+            page.setLifecycleState(page.Active)
+
+    def _restore_view_state(self):
+        """zoom and scroll position of the page before the discard"""
+        if self.view_state is None or self.view is None:
+            return
+        zoom, scroll, current = self.view_state
+        self.view_state = None
+        self.view.setZoomFactor(zoom)
+        self.view.page().runJavaScript(
+            "window.scrollTo(%d, %d);" % (scroll.x(), scroll.y()))
+
+    def load_view(self):
+        """load syncthing web UI once, when syncthing is ready"""
+        if (self.view is not None and self.ready and not self.view_loaded and
+                self.isVisible()):
+            # webview require 70Mb to show webpage
+            self.view_loaded = True
+            self.view.load(QUrl(self.manager.url))
+
+    @pyqtSlot(str, str)
+    def gui_moved(self, url, apikey):
+        """syncthing GUI address changed: load the Web UI from there"""
+        if self.view_loaded:
+            self.view_loaded = False
+            self.load_view()
+
+    def syncthing_kill_all(self):
+        """explicit sweep: kill every syncthing of the current user"""
+        if QMessageBox.question(
+                self, __doc__.title(),
+                "Kill every Syncthing process of the current user?",
+                QMessageBox.Yes | QMessageBox.No,
+                QMessageBox.No) != QMessageBox.Yes:
+            return
+        self.manager.syncthing_kill_all()
 
     @pyqtSlot()
-    def _process_failed(self):
-        """Read and return errors."""
-        self.statusBar().showMessage("ERROR:Fail:Syncthing blow up in pieces!")
-        print("ERROR:Fail:Syncthing blow up in pieces! Wheres your God now?")
-        return str(self.process.readAllStandardError()).strip().lower()
+    def syncthing_ready(self):
+        """syncthing answer health check"""
+        self.load_view()
+        if self.dashboard is not None:
+            self.dashboard.refresh()
+
+    @pyqtSlot(object)
+    def syncthing_event(self, event):
+        """dispatch syncthing event (GUI thread)"""
+        if self.dashboard is not None:
+            self.dashboard.syncthing_event(event)
+
+    @pyqtSlot(list)
+    def console_lines(self, lines):
+        """store syncthing output lines, show those passing the filter"""
+        first = self.logstore.extend(lines)
+        if self.log_filter is None:
+            self.consoletextedit.append_lines(lines)
+        else:
+            # only the new lines are searched
+            self.consoletextedit.append_lines(
+                [self.logstore.line(num) for num in
+                 self.logstore.select(start=first, **self.log_filter)])
 
     @pyqtSlot()
-    def _process_dataReady(self):
-        """get process stdout/strerr when data ready"""
-        # TODO: format the msg to remove extra b and \n
-        msg = str(self.process.readAll())
-        lines = msg.split("'")
-        tmp = lines[1]
-        tmp = tmp.splitlines(0)
-        lines = tmp[0].split("\\n")
-        for line in lines:
-            if line != "":
-                # print("1: %s" % line)
-                self.consoletextedit.append(line)
-        self.consoletextedit.ensureCursorVisible()
-        # autoscroll to last line's first character
-        self.consoletextedit.moveCursor(QTextCursor.End)
-        self.consoletextedit.moveCursor(QTextCursor.StartOfLine)
+    def apply_log_filter(self):
+        """show stored lines matching level, time range and regex"""
+        level = self.level_combo.currentIndex()
+        since = self.since_combo.currentData()
+        text = self.search_edit.text()
+        if not level and since is None and not text:
+            self.clear_log_filter()
+            return
+        try:
+            pattern = re.compile(text, re.MULTILINE) if text else None
+        except re.error as err:
+            self.statusBar().showMessage("Bad regex: %s" % err, 5000)
+            return
+        self.log_filter = {
+            "levels": range(level, len(LogStore.LEVELS)) if level else None,
+            "pattern": pattern,
+            "since": time.time() - since if since else None}
+        start = time.monotonic()
+        nums = self.logstore.select(
+            limit=self.consoletextedit.maximumBlockCount(), **self.log_filter)
+        elapsed = time.monotonic() - start
+        self.consoletextedit.show_lines(
+            [self.logstore.line(num) for num in nums])
+        self.statusBar().showMessage("%d lines in %.1f ms (%d searched)" % (
+            len(nums), elapsed * 1000, len(self.logstore)), 5000)
 
-    @pyqtSlot(QProcess.ProcessState)
-    def _process_stateChanged(self, state):
-        """ procress_stateChanged """
-        # TODO handle procress_stateChanged
-        print("procress_stateChanged: %s" % state)
+    @pyqtSlot()
+    def clear_log_filter(self):
+        """back to live syncthing output"""
+        self.log_filter = None
+        self.level_combo.setCurrentIndex(0)
+        self.since_combo.setCurrentIndex(0)
+        self.search_edit.clear()
+        store = self.logstore
+        self.consoletextedit.show_lines([store.line(num) for num in range(
+            max(store.base,
+                store.end - self.consoletextedit.maximumBlockCount()),
+            store.end)])
 
     def center(self):
         """Center Window on the Current Screen,with Multi-Monitor support."""
@@ -526,32 +4406,27 @@ class MainWindow(QMainWindow):
     @pyqtSlot()
     def start_loading(self):
         """show progressbar when downloading data"""
+        self.load_started = time.monotonic()
+        self.title_pending = True
         self.progressbar.show()
 
     @pyqtSlot(bool)
     def finish_loading(self, finished):
         """Finished loading content."""
         if not finished:
-            # TODO: When loading fail, what should we do?
+            # view is only loaded once syncthing is ready, do not restart
+            # syncthing from here: load again on next ready/show
             print("load fail")
-            if self.process.state() == QProcess.NotRunning:
-                self.run()
-                self.view.reload()
-            # if self.process.state != QProcess.Running:
-            #    print("syncthing is not running: %s" % self.process.state())
-            # pass
-        print("finish_loading: %s" % finished)
+            self.view_loaded = False
+        else:
+            self._restore_view_state()
+        print("finish_loading: %s in %.0f ms, renderer RSS %s" % (
+            finished, 1000 * (time.monotonic() - self.load_started),
+            human_bytes(webengine_rss())))
         # TODO: WebEngineView does not have following function?
         # self.view.settings().clearMemoryCaches()
         # self.view.settings().clearIconDatabase()
-
-        # print("finish_loading %s" % datetime.strftime(datetime.now(),
-        #                                              '%Y-%m-%d %H:%M:%S'))
-        # TODO: following line need 6 sec to finish!!
-        # TODO: (" INFO: Loading Web UI increases >250Mb RAM!.")
-        # self.view.page().mainFrame().evaluateJavaScript(BASE_JS)
-        # print("finish_loading %s" % datetime.strftime(datetime.now(),
-        #                                             '%Y-%m-%d %H:%M:%S'))
+        # BASE_JS is injected at document creation (webui_scripts)
         self.progressbar.hide()
 
     @pyqtSlot(int)
@@ -566,6 +4441,11 @@ class MainWindow(QMainWindow):
         # print("title: %s" % title)
         if len(title.strip()) > 0:
             self.setWindowTitle(self.view.title()[:99])
+            # until the Web UI set it, the title is the page url
+            if self.title_pending and self.view.url().host() not in title:
+                self.title_pending = False
+                print("Web UI ready in %.0f ms" % (
+                    1000 * (time.monotonic() - self.load_started)))
 
     def check_for_updates(self):
         """Method to check for updates from Git repo versus this version."""
@@ -599,21 +4479,6 @@ class MainWindow(QMainWindow):
             self.hide()
             event.ignore()
 
-    def app_exit(self):
-        """exit app"""
-        # TODO: do we need to show UI when doing close?
-        # self.show_gui()
-        # TODO: show QMessageBox on all virtual desktop
-        the_conditional_is_true = QMessageBox.question(
-            self, __doc__.title(), 'Quit %s?' % __doc__,
-            QMessageBox.Yes | QMessageBox.No,
-            QMessageBox.No) == QMessageBox.Yes
-        if the_conditional_is_true:
-            self.syncthing_stop()
-            self.ani_stop = True
-            QApplication.instance().quit
-            quit()
-
 ###############################################################################
 
 
@@ -624,10 +4489,46 @@ class Application(QApplication):
         return QApplication.event(self, event_)
 
 
+class SignalWatcher(QObject):
+    """
+    handle SIGINT, SIGTERM and SIGHUP in the event loop: the C level
+    handler write the signal number to a socket watched by a
+    QSocketNotifier, no timer needed to give Python a chance to run
+    """
+    hangup = pyqtSignal()  # SIGHUP: reload settings
+
+    def __init__(self, parent=None):
+        """ construct """
+        super(SignalWatcher, self).__init__(parent)
+        self._signal_read, self._signal_write = socket.socketpair()
+        self._signal_read.setblocking(False)
+        self._signal_write.setblocking(False)
+        signal.set_wakeup_fd(self._signal_write.fileno())
+        for name in ("SIGINT", "SIGTERM", "SIGHUP"):
+            if hasattr(signal, name):
+                signal.signal(getattr(signal, name), signal_handler)
+        self._signal_notifier = QSocketNotifier(
+            self._signal_read.fileno(), QSocketNotifier.Read, self)
+        self._signal_notifier.activated.connect(self._signal_received)
+
+    @pyqtSlot()
+    def _signal_received(self):
+        """dispatch signals written to the wakeup socket"""
+        try:
+            data = self._signal_read.recv(64)
+        except OSError:
+            return
+        for signum in data:
+            if signum == getattr(signal, "SIGHUP", None):
+                self.hangup.emit()
+            else:
+                print("signal %d, quit" % signum)
+                QCoreApplication.instance().quit()
+
+
 def signal_handler(signal_, frame):
-    """signal handler"""
-    print('You pressed Ctrl+C!')
-    sys.exit(0)
+    """python level handler, work is done by SignalWatcher"""
+    pass
 
 
 def main():
@@ -641,32 +4542,103 @@ def main():
         libc.prctl(15, byref(buff), 0, 0, 0)
     except Exception as reason:
         print(reason)
-    # app = QApplication(sys.argv)
-    app = Application(sys.argv)
-    # Connect your cleanup function to signal.SIGINT
-    signal.signal(signal.SIGINT, signal_handler)
-    # And start a timer to call Application.event repeatedly.
-    # You can change the timer parameter as you like.
-    app.startTimer(200)
-
-    app.setApplicationName(__doc__.strip().lower())
-    app.setOrganizationName(__doc__.strip().lower())
-    app.setOrganizationDomain(__doc__.strip())
-    web = MainWindow()
-    app.aboutToQuit.connect(web.syncthing_stop)
     try:
-        opts, args = getopt(sys.argv[1:], 'hv', ('version', 'help'))
+        opts, args = getopt(sys.argv[1:], 'hvd',
+                            ('version', 'help', 'dashboard',
+                             'startup-timing', 'headless', 'tray-only'))
     except:
-        pass
+        opts = []
+    dashboard = timing = False
+    mode = "window"
     for opt, val in opts:
         if opt in ('-h', '--help'):
             print(''' Usage:
                   -h, --help        Show help informations and exit.
-                  -v, --version     Show version information and exit.''')
+                  -v, --version     Show version information and exit.
+                  -d, --dashboard   Native dashboard, no Web UI loaded.
+                  --tray-only       Tray icon only, no main window.
+                  --headless        No GUI at all: supervise syncthing.
+                  --startup-timing  Print duration of startup phases.''')
             return sys.exit(1)
         elif opt in ('-v', '--version'):
             print(__version__)
             return sys.exit(1)
+        elif opt in ('-d', '--dashboard'):
+            dashboard = True
+        elif opt == '--startup-timing':
+            timing = True
+        elif opt == '--headless':
+            mode = "headless"
+        elif opt == '--tray-only':
+            mode = "tray"
+    now = startup_phase("imports", _START)
+    if mode == "headless":
+        # no display needed, no widget or icon created
+        app = QCoreApplication(sys.argv)
+    else:
+        # QtWebEngine is imported on demand, after QApplication creation
+        QApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
+        app = Application(sys.argv)
+        # the main window hide on close, quit from the tray menu
+        app.setQuitOnLastWindowClosed(False)
+    signals = SignalWatcher(app)
+
+    # settings in ~/.config/syncthingui/syncthingui.conf
+    app.setApplicationName(appname)
+    app.setOrganizationName(appname)
+    app.setOrganizationDomain(__doc__.strip())
+    now = startup_phase("QApplication", now)
+    # tray and syncthing first, the window is built but not shown
+    managers = [SyncthingManager(instance["url"], instance["apikey"],
+                                 instance["name"], instance["home"], index)
+                for index, instance in enumerate(instance_settings())]
+    now = startup_phase("init_process", now)
+    tray = None
+    if mode != "headless":
+        # tray animation frames, first one is the application icon
+        ratios = sorted(set([1.0] + [screen.devicePixelRatio() for screen
+                                     in QApplication.screens()]))
+        icons = icon_frames(
+            frames=int(QSettings().value("tray/frames", ICON_FRAMES)),
+            ratios=ratios)
+        tray = SyncthingTray(managers, icons)
+        fleet = fleet_settings()
+        if fleet:
+            settings = QSettings()
+            tray.fleet = FleetMonitor(
+                fleet,
+                float(settings.value("fleet/interval", FLEET_INTERVAL)),
+                int(settings.value("fleet/concurrency", FLEET_CONCURRENCY)),
+                float(settings.value("fleet/timeout", FLEET_TIMEOUT)),
+                parent=tray)
+            tray.fleet.start()
+            app.aboutToQuit.connect(tray.fleet.stop)
+            tray.build_menu()
+        tray.show()
+        now = startup_phase("init_systray", now)
+    for manager in managers:
+        manager.attach_or_run()
+        signals.hangup.connect(manager.reload_settings)
+        app.aboutToQuit.connect(manager.syncthing_quit)
+        app.aboutToQuit.connect(manager.events_stop)
+        app.aboutToQuit.connect(manager.close_log)
+        app.aboutToQuit.connect(manager.stop_exporter)
+    startup_phase("run", now)
+    if mode == "window":
+        def new_window(manager):
+            """window of an instance, the first one is built at startup"""
+            web = MainWindow(manager, icons, dashboard)
+            web.tray = tray
+            tray.set_window(web)
+            web.startup_timing = timing
+            signals.hangup.connect(web.reload_settings)
+            return web
+        tray.window_factory = new_window
+        new_window(managers[0])
+    if timing:
+        # report once the event loop is running
+        QTimer.singleShot(0, startup_report)
+    app.aboutToQuit.connect(io_thread_stop)
     # web.show()  # comment out to hide/show main window, normally don't needed
     sys.exit(app.exec_())
 
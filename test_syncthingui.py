@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# PEP8:OK, LINT:OK, PY3:OK
+
+'''
+SyncthinGUI unit tests.
+
+    python3 -m unittest test_syncthingui
+'''
+
+import os
+import random
+import re
+import socket
+import tempfile
+import time
+import unittest
+from threading import Thread
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import QCoreApplication  # noqa: E402
+
+import fleet_stub  # noqa: E402
+from PyQt5.QtTest import QAbstractItemModelTester  # noqa: E402
+
+from syncthingui import (CompletionAggregator,  # noqa: E402
+                         CompletionModel, FleetMonitor, HostPool,
+                         LineReader, LogStore, RestClient, SyncthingEvent,
+                         SyncthingManager, io_thread_stop)
+
+APP = None
+
+
+def setUpModule():
+    """one QCoreApplication, settings apart from the user ones"""
+    global APP
+    APP = QCoreApplication.instance() or QCoreApplication([])
+    APP.setOrganizationName("syncthingui-test")
+    APP.setApplicationName("syncthingui-test")
+
+
+def tearDownModule():
+    """stop the shared I/O thread"""
+    io_thread_stop()
+
+
+def wait(done, timeout=5.0):
+    """run the event loop until done() or timeout, return done()"""
+    end = time.monotonic() + timeout
+    while not done() and time.monotonic() < end:
+        APP.processEvents()
+        time.sleep(0.005)
+    return done()
+
+
+def stub_server(**kwargs):
+    """fleet_stub node on an ephemeral port, return (server, url)"""
+    server = fleet_stub.serve(0, 0, 0.0, False, **kwargs)
+    return server, "http://127.0.0.1:%d" % server.server_address[1]
+
+
+def expected_lines(data):
+    """lines of the whole stream, as a single read would give them"""
+    lines = data.decode("utf-8", "replace").split("\n")
+    if not lines[-1]:
+        lines.pop()
+    return [line[:-1] if line.endswith("\r") else line for line in lines]
+
+
+def read_split(data, cuts):
+    """feed data to a LineReader cut at cuts, then flush"""
+    reader = LineReader()
+    lines = []
+    start = 0
+    for cut in sorted(cuts) + [len(data)]:
+        lines.extend(reader.feed(data[start:cut]))
+        start = cut
+    lines.extend(reader.flush())
+    return lines
+
+
+class LineReaderTest(unittest.TestCase):
+    """LineReader give the same lines however the stream is cut"""
+    SAMPLES = [
+        "[ABCDE] 12:00:00 INFO: café € \U0001f600 日本\n",
+        "windows\r\nline\r\n\r\nend\r\n",
+        "quoted \"path with \\\" quote\" and 'single'\n",
+        "\n\n\nempty lines\n\n",
+        "x" * 100000 + "\n" + "é" * 50000 + "\r\n",
+        "no newline at end é\r",
+        "",
+    ]
+
+    def check(self, data, cuts):
+        """compare one split with the whole stream"""
+        self.assertEqual(read_split(data, cuts), expected_lines(data),
+                         "cuts %r" % sorted(cuts)[:20])
+
+    def test_every_single_cut(self):
+        """one cut anywhere, inside multi-byte chars and CRLF too"""
+        for sample in self.SAMPLES[:4]:
+            data = sample.encode("utf-8")
+            for cut in range(len(data) + 1):
+                self.check(data, [cut])
+
+    def test_random_cuts(self):
+        """many random cuts, one byte reads included"""
+        rand = random.Random(0)
+        for sample in self.SAMPLES:
+            data = sample.encode("utf-8")
+            for _ in range(50):
+                count = rand.randint(0, min(len(data), 200))
+                self.check(data, rand.sample(range(len(data) + 1), count))
+        data = "".join(self.SAMPLES[:4]).encode("utf-8")
+        self.check(data, range(len(data)))
+
+    def test_crlf_split(self):
+        """\\r and \\n in different reads"""
+        reader = LineReader()
+        self.assertEqual(reader.feed(b"one\r"), [])
+        self.assertEqual(reader.feed(b"\ntwo\r"), ["one"])
+        self.assertEqual(reader.feed(b"\n"), ["two"])
+        self.assertEqual(reader.flush(), [])
+
+    def test_utf8_split(self):
+        """a 4 bytes char read one byte at a time"""
+        reader = LineReader()
+        data = "\U0001f600\n".encode("utf-8")
+        lines = []
+        for pos in range(len(data)):
+            lines.extend(reader.feed(data[pos:pos + 1]))
+        self.assertEqual(lines, ["\U0001f600"])
+
+    def test_long_line(self):
+        """100 kB line in 1 kB reads, nothing returned before its end"""
+        reader = LineReader()
+        data = b"a" * 100000
+        for pos in range(0, len(data), 1000):
+            self.assertEqual(reader.feed(data[pos:pos + 1000]), [])
+        self.assertEqual(reader.feed(b"\nb"), ["a" * 100000])
+        self.assertEqual(reader.flush(), ["b"])
+
+    def test_invalid_utf8(self):
+        """bad bytes are replaced, not raised"""
+        data = b"bad \xff\xfe byte\ncut \xe2\x82"
+        self.assertEqual(read_split(data, [5, 14]), expected_lines(data))
+
+
+class LogStoreTest(unittest.TestCase):
+    """regex filter on joined chunks give the lines a line by line search
+    give, across chunk boundaries, trimming and live appends"""
+    LEVELS = ("INFO", "DEBUG", "WARNING")
+
+    def setUp(self):
+        """small chunks and capacity, so both are crossed often"""
+        self.rand = random.Random(1)
+        self.store = LogStore(capacity=100)
+        self.store.CHUNK = 7
+        self.all = []  # every line ever appended
+
+    def add(self, count):
+        """append count random syncthing lines, return first number"""
+        words = ("alpha", "beta", "gamma", "éé")
+        lines = []
+        for num in range(count):
+            lines.append("[ABCDE] 2024/01/02 10:00:%02d %s: %s" % (
+                num % 60, self.rand.choice(self.LEVELS),
+                " ".join(self.rand.choice(words)
+                         for _ in range(self.rand.randint(0, 4)))))
+        self.all.extend(lines)
+        return self.store.extend(lines)
+
+    def expected(self, pattern, levels=None, start=0):
+        """numbers of kept lines matching, one by one"""
+        return [num for num in range(max(start, self.store.base),
+                                     self.store.end)
+                if pattern.search(self.all[num]) and
+                (levels is None or LogStore.LEVELS.index(
+                    self.all[num].split()[3][:-1]) in levels)]
+
+    def check(self, **kwargs):
+        """select() against expected()"""
+        for text in ("alpha", "^\\[ABCDE\\] .* beta$", "gamma beta",
+                     "é+$", "WARNING: $"):
+            pattern = re.compile(text, re.MULTILINE)
+            self.assertEqual(self.store.select(pattern=pattern, **kwargs),
+                             self.expected(pattern, **kwargs), text)
+
+    def test_search(self):
+        """whole store, levels, start, after trims"""
+        for _ in range(30):
+            first = self.add(self.rand.randint(1, 20))
+            self.check()
+            self.check(levels=[LogStore.LEVELS.index("WARNING")])
+            self.check(start=first)
+            self.check(start=self.store.end - self.rand.randint(1, 30))
+        self.assertGreater(self.store.base, 0)
+
+    def test_limit(self):
+        """only the last matching lines"""
+        self.add(250)
+        pattern = re.compile("beta")
+        self.assertEqual(self.store.select(pattern=pattern, limit=3),
+                         self.expected(pattern)[-3:])
+
+
+class SyncthingManagerTest(unittest.TestCase):
+    """stop of a syncthing we did not start"""
+
+    def setUp(self):
+        """manager attached to a stub syncthing, no API key"""
+        self.server, url = stub_server()
+        self.home = tempfile.TemporaryDirectory()
+        self.manager = SyncthingManager(url, "", "test", self.home.name)
+        self.manager.run = lambda: self.fail("own syncthing started")
+        self.messages = []
+        self.manager.message.connect(
+            lambda text, timeout: self.messages.append(text))
+        self.manager.attach_or_run()
+        self.assertTrue(wait(lambda: self.manager.ready))
+
+    def tearDown(self):
+        """stop stub"""
+        self.manager.probe.stop()
+        self.manager.stop_timer.stop()
+        self.server.shutdown()
+        self.server.server_close()
+        self.home.cleanup()
+
+    def test_attached_stop_without_apikey(self):
+        """nothing can stop it: it stays attached and ready"""
+        self.assertTrue(self.manager.attached)
+        self.manager.folder_states["folder0"] = "idle"
+        called = []
+        self.manager.syncthing_stop(then=lambda: called.append(True))
+        self.assertTrue(self.manager.attached)
+        self.assertTrue(self.manager.ready)
+        self.assertEqual(self.manager.folder_states, {"folder0": "idle"})
+        self.assertFalse(self.manager.stop_timer.isActive())
+        self.assertEqual(called, [])
+        self.assertIn("API key needed", self.messages[-1])
+        # syncthing_quit leave it running, without trying to stop it
+        self.manager.syncthing_quit()
+
+
+def free_url():
+    """url of a port nothing listen on"""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return "http://127.0.0.1:%d" % port
+
+
+class FleetTest(unittest.TestCase):
+    """fleet polling against fleet_stub nodes on ephemeral ports"""
+
+    def setUp(self):
+        """two good nodes, one answering unexpected JSON"""
+        self.servers = []
+        self.nodes = []
+        for num, broken in enumerate((False, False, True)):
+            server, url = stub_server(broken=broken)
+            self.servers.append(server)
+            self.nodes.append(dict(name="stub%d" % num, url=url,
+                                   apikey=fleet_stub.APIKEY))
+        self.monitor = None
+
+    def tearDown(self):
+        """stop monitor and stubs"""
+        if self.monitor is not None:
+            self.monitor.stop()
+        # each shutdown() wait up to 0.5 sec: together
+        threads = [Thread(target=server.shutdown) for server in self.servers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for server in self.servers:
+            server.server_close()
+
+    def poll(self, nodes, rounds=1):
+        """run rounds of FleetMonitor polls, return the updated nodes"""
+        self.monitor = FleetMonitor(nodes, interval=3600, concurrency=4,
+                                    timeout=1.0)
+        updates = []
+        self.monitor.updated.connect(updates.append)
+        for num in range(rounds):
+            self.monitor.poll()
+            self.assertTrue(wait(
+                lambda: len(updates) == len(nodes) * (num + 1)), updates)
+        return self.monitor.nodes
+
+    def test_host_pool_reuse(self):
+        """keep-alive: one connection for many requests"""
+        pool = HostPool(self.nodes[0]["url"])
+        for _ in range(5):
+            status, data = pool.get("/rest/system/version",
+                                    fleet_stub.APIKEY)
+            self.assertEqual(status, 200)
+            self.assertTrue(data["version"].startswith("v1."))
+        self.assertEqual(self.servers[0].connections, 1)
+        self.assertEqual(pool.get("/rest/system/version", "wrong")[0], 403)
+
+    def test_status(self):
+        """health, version, folder errors and bytes needed"""
+        node = self.poll(self.nodes[:1])[0]
+        self.assertTrue(node.healthy)
+        self.assertEqual(node.error, "")
+        self.assertEqual(node.version, "v1.27.0")
+        self.assertEqual(node.folder_errors, fleet_stub.FOLDERS)
+        self.assertGreater(node.need_bytes, 0)
+        self.assertIsNotNone(node.last_seen)
+        self.assertFalse(node.busy)
+
+    def test_connection_reuse(self):
+        """later rounds reuse the connections of the first"""
+        self.poll(self.nodes[:2], rounds=3)
+        self.assertEqual([server.connections for server in
+                          self.servers[:2]], [1, 1])
+
+    def test_wrong_apikey(self):
+        """healthy, but details refused"""
+        self.nodes[0]["apikey"] = "wrong"
+        node = self.poll(self.nodes[:1])[0]
+        self.assertTrue(node.healthy)
+        self.assertIn("API key", node.error)
+
+    def test_unexpected_json(self):
+        """reported unhealthy and polled again, never left busy"""
+        nodes = self.poll(self.nodes, rounds=2)
+        self.assertFalse(nodes[2].healthy)
+        self.assertIn("not a syncthing answer", nodes[2].error)
+        self.assertFalse(any(node.busy for node in nodes))
+        self.assertTrue(nodes[0].healthy and nodes[1].healthy)
+
+    def test_unreachable(self):
+        """nothing listening: error, other nodes still polled"""
+        nodes = self.poll(self.nodes[:1] + [dict(
+            name="gone", url=free_url(), apikey="")], rounds=2)
+        self.assertTrue(nodes[0].healthy)
+        self.assertFalse(nodes[1].healthy)
+        self.assertTrue(nodes[1].error)
+        self.assertFalse(nodes[1].busy)
+
+
+class CompletionTest(unittest.TestCase):
+    """completion matrix of a fleet_stub topology"""
+
+    def setUp(self):
+        """3 folders x 2 devices"""
+        self.server, url = stub_server(config=fleet_stub.topology(3, 2))
+        self.aggregator = CompletionAggregator(
+            RestClient(url, fleet_stub.APIKEY), 4)
+        self.model = CompletionModel(self.aggregator)
+        self.tester = QAbstractItemModelTester(
+            self.model, QAbstractItemModelTester.FailureReportingMode.Fatal)
+        self.resets = []
+        self.model.modelAboutToBeReset.connect(
+            lambda: self.resets.append(("begin", self.model.rowCount(),
+                                        self.model.columnCount())))
+        self.model.modelReset.connect(
+            lambda: self.resets.append(("end", self.model.rowCount(),
+                                        self.model.columnCount())))
+
+    def tearDown(self):
+        """stop stub"""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_sweep_and_topology_change(self):
+        """dimensions change only between begin and end of a reset"""
+        summary = self.aggregator.summary()
+        self.aggregator.refresh()
+        self.assertTrue(wait(lambda: self.aggregator.swept))
+        self.assertEqual(summary, (0, 0, 0, 0))
+        self.assertEqual(self.resets, [("begin", 0, 0), ("end", 3, 2)])
+        self.assertEqual(len(self.aggregator.cache), 6)
+        self.server.config = fleet_stub.topology(5, 3)
+        self.aggregator.syncthing_event(
+            SyncthingEvent(1, "ConfigSaved", "", {}))
+        self.assertTrue(wait(lambda: len(self.aggregator.cache) == 15))
+        self.assertEqual(self.resets[2:], [("begin", 3, 2), ("end", 5, 3)])
+        self.assertTrue(self.model.data(self.model.index(4, 2)).endswith(
+            " %"))
+
+    def test_pending(self):
+        """devices without every cell known are pending, not up to date"""
+        self.aggregator.refresh()
+        self.assertTrue(wait(lambda: self.aggregator.swept))
+        folder, device = sorted(self.aggregator.pairs)[0]
+        for pair in self.aggregator.pairs:
+            self.aggregator.cache[pair] = (100.0, 0)
+        self.assertEqual(self.aggregator.summary(), (2, 0, 2, 0))
+        del self.aggregator.cache[(folder, device)]
+        self.assertEqual(self.aggregator.summary(), (1, 1, 2, 0))
+        self.aggregator.cache.clear()
+        self.assertEqual(self.aggregator.summary(), (0, 2, 2, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()